@@ -1,9 +1,12 @@
-import hashlib
 import os
-import time
-import datetime
+import math
+import operator
+import uuid
+from datetime import datetime
+from flask import current_app
+from flask import g
 from flask import request
-from flask import jsonify
+from flask import stream_with_context
 from flask_api import FlaskAPI
 from flask_cors import CORS
 from flask_httpauth import HTTPBasicAuth
@@ -11,28 +14,86 @@ from flask_httpauth import HTTPTokenAuth
 from itsdangerous import TimedJSONWebSignatureSerializer as Serializer
 from itsdangerous import BadSignature
 from itsdangerous import SignatureExpired
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import load_only
 from instance.config import configurations  # import configurations file
+from app.cache import TTLCache
+from app.compression import compressor
+from app.conditional import cache_headers
+from app.conditional import is_not_modified
+from app.conditional import list_etag
+from app.conditional import lock_for_conditional_write
+from app.conditional import not_modified_response
+from app.conditional import page_etag
+from app.conditional import precondition_failed
+from app.hashing import password_hasher
+from app.ids import id_generator
+from app.ids import MAX_ID
+from app.ids import is_valid_id
+from app.registrations import registration_log
+from app.replicas import replica_router
+from app.revocation import revocation_store
+from app.search import search
+from app.serialization import json_serializer
+from app.pagination import decode_cursor
+from app.pagination import iter_chunks
+from app.pagination import paginate
+from app.pagination import pagination_headers
+from app.timestamps import format_timestamp
+from app.timestamps import parse_timestamp
+from app.timestamps import utcnow
 from app.models import db
 from app.models import User
 from app.models import Shoppinglists
 from app.models import ShoppingListItems
 
 secret_key = 'this-is-my-key-(dfgvbnhj!@#$%^&*)'
-user_logged_in = None
 auth = HTTPBasicAuth()
 token_auth = HTTPTokenAuth('Bearer')
 serializer = Serializer(secret_key, expires_in=900)
 
+# maps authentication tokens to the (detached) user they identify and the
+# token's ID so that authenticated requests do not need a database round trip
+token_cache = TTLCache(max_size=4096, ttl=serializer.expires_in)
+
+# usernames recently found not to exist, so that repeated failed logins do
+# not reach the database. Registrations through other worker processes are
+# picked up from registration_log; see caches_unknown_usernames for several
+# hosts
+unknown_usernames = TTLCache(max_size=10000, ttl=60)
+
+# details that shoppinglist responses can be extended with, see get_includes
+LIST_INCLUDES = ('items', 'totals')
+
+# fields of shoppinglists and items that responses can be narrowed to, see
+# get_fields
+LIST_FIELDS = ('id', 'title', 'created_on', 'modified_on')
+ITEM_FIELDS = ('id', 'name', 'price', 'quantity')
+
+# shoppinglist columns read for the `totals` include and for cache headers
+LIST_TOTALS_COLUMNS = ('item_count', 'total_cost', 'last_item_change')
+LIST_CACHE_COLUMNS = ('id', 'version', 'modified_on', 'last_item_change')
+
 
 def create_app(config_mode):
     flask_api = FlaskAPI(__name__, instance_relative_config=True)
-    CORS(flask_api)  # allow cross-origin-resource-sharing
+    # allow cross-origin-resource-sharing, letting browsers read the
+    # pagination headers
+    CORS(flask_api, expose_headers=['Link', 'X-Next-Cursor'])
     flask_api.config.from_object(configurations[config_mode])
     flask_api.url_map.strict_slashes = False
     flask_api.config.from_pyfile('config.py')
     flask_api.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     flask_api.secret_key = secret_key
     db.init_app(flask_api)
+    id_generator.init_app(flask_api)
+    password_hasher.init_app(flask_api)
+    revocation_store.init_app(flask_api)
+    registration_log.init_app(flask_api)
+    replica_router.init_app(flask_api)
+    compressor.init_app(flask_api)
+    json_serializer.init_app(flask_api)
 
     @flask_api.route('/', methods=['GET'])
     def index():
@@ -43,6 +104,21 @@ def create_app(config_mode):
         }
         return make_response(data, status_code=200)
 
+    @flask_api.route('/status/pool', methods=['GET'])
+    def pool_status():
+        """Reports the database connection pool usage of the worker process
+        that handles the request"""
+        stats = getattr(db.engine.pool, 'stats', None)
+        if not flask_api.config.get('PUBLISH_POOL_STATS') or stats is None:
+            data = {
+                "error_msg": "Pool statistics are not available"
+            }
+            return make_response(data, status_code=404)
+
+        data = stats()
+        data['pid'] = os.getpid()
+        return make_response(data, status_code=200)
+
     @flask_api.errorhandler(404)
     def route_not_found(e):
         data = {
@@ -103,10 +179,12 @@ def create_app(config_mode):
             return make_response(data, status_code=409)
 
         # Create a user
-        password_hash = sha1_hash(pword)
+        password_hash = password_hasher.hash_password(pword)
         new_user = User(username=username, password_hash=password_hash,
                         answer=answer, security_question=security_question)
         new_user.save()
+        unknown_usernames.delete(username)
+        registration_log.record(username, unknown_usernames.ttl)
 
         data = {
             "message": "user `{}` has been created".format(username),
@@ -117,7 +195,7 @@ def create_app(config_mode):
     @flask_api.route('/user/login/', methods=['POST'])
     def authenticate_user():
         pword = str(request.data.get('password', ''))
-        username = str(request.data.get('username', ''))
+        username = str(request.data.get('username', '')).lower().strip()
 
         if not username or not pword:
             data = {
@@ -126,7 +204,7 @@ def create_app(config_mode):
             return make_response(data, status_code=400)
 
         if verify_password(username, pword):
-            token = generate_auth_token()
+            token = generate_auth_token(g.user)
             data = {
                 "token": token.decode('ascii')
             }
@@ -150,24 +228,40 @@ def create_app(config_mode):
                     (boolen): True if user has been authorised, otherwise
                     returns False
             """
+        use_cache = caches_unknown_usernames()
+        if use_cache and unknown_usernames.get(username):
+            if not registration_log.is_registered(username):
+                return False
+            # registered through another worker since it was cached here
+            unknown_usernames.delete(username)
+
         # attempt authentication using password
-        password_hash = sha1_hash(pword)
-        user = User.query.filter_by(username=username,
-                                    password_hash=password_hash).first()
-        if user:
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            if use_cache:
+                unknown_usernames.set(username, True)
+            return False
+
+        if password_hasher.check_password(pword, user.password_hash):
             # Credentials are authentic
-            global user_logged_in
-            user_logged_in = user
+            if password_hasher.needs_rehash(user.password_hash):
+                # upgrade legacy or weaker hashes while the password is known
+                user.password_hash = password_hasher.hash_password(pword)
+                user.save()
+                invalidate_cached_user(user.id)
+
+            g.user = user
             return True
 
         return False
 
     @flask_api.route('/user/logout/', methods=['GET'])
     def logout_user():
-        global user_logged_in
-
-        user_logged_in = None
-        flask_api.secret_key = os.urandom(24)  # create a random secret key
+        # revoke the token the request was made with, if any
+        token = request.headers.get('Authorization', '').replace('Bearer ',
+                                                                 '', 1)
+        if token:
+            revoke_auth_token(token.strip())
 
         data = {
             "message": "User logged out"
@@ -186,8 +280,9 @@ def create_app(config_mode):
             }
             return make_response(data, status_code=400)
 
-        user_logged_in.password_hash = sha1_hash(pword)
-        user_logged_in.save()
+        g.user.password_hash = password_hasher.hash_password(pword)
+        g.user.save()
+        invalidate_cached_user(g.user.id)
         data = {
             'message': "Password has been changed successfully"
         }
@@ -247,8 +342,9 @@ def create_app(config_mode):
             }
             return make_response(data, status_code=400)
 
-        user.password_hash = sha1_hash(pword)
+        user.password_hash = password_hasher.hash_password(pword)
         user.save()
+        invalidate_cached_user(user.id)
         data = {
             'message': "Password has been reset successfully"
         }
@@ -258,7 +354,7 @@ def create_app(config_mode):
     @token_auth.login_required
     def shoppinglists():
 
-        user_id = user_logged_in.id
+        user_id = g.user.id
 
         if request.method == 'POST':
 
@@ -270,9 +366,13 @@ def create_app(config_mode):
             if error_message:
                 return error_message
 
-            # create shoppinglist
+            # create shoppinglist; the database rejects duplicate titles
             shopping_list = Shoppinglists(title=title, user_id=user_id)
-            shopping_list.save()
+            error_message = save_unique(
+                shopping_list, "`{}` already exists".format(title))
+            if error_message:
+                return error_message
+
             data = {
                 'id': shopping_list.id,
                 'title': shopping_list.title
@@ -281,78 +381,128 @@ def create_app(config_mode):
 
         # METHOD GET
 
-        shopping_lists = None
-        limit = None
+        next_cursor = None
 
         # check if GET parameters has been parsed with the path
         args = request.args
-        if args:
+        limit, after_id, error_message = get_pagination_args(args)
+        if error_message:
+            return error_message
 
-            if 'limit' in args:
-                # limit number of results returned
-                limit = int(args['limit'])
+        timestamp_filters, error_message = get_timestamp_filters(args)
+        if error_message:
+            return error_message
 
-            if 'q' in args:
-                # search for shoppinglists that contain keyword provided
-                keyword = str(args['q']).lower()
-
-                if limit:
-                    # search with pagination
-                    shopping_lists = Shoppinglists.query.filter(
-                        Shoppinglists.title.like("%{}%".format(keyword)),
-                        Shoppinglists.user_id == user_id
-                    ).limit(limit).all()
-
-                else:
-                    # search without pagination
-                    shopping_lists = Shoppinglists.query.filter(
-                        Shoppinglists.title.like("%{}%".format(keyword)),
-                        Shoppinglists.user_id == user_id
-                    ).all()
-
-                if len(shopping_lists) < 1:
-                    data = {
-                        'error_msg': "No shoppinglist matches "
-                                     "the keyword `{}`.".format(keyword)
-                    }
-                    return make_response(data, 404)
-
-        if not shopping_lists:
+        includes, error_message = get_includes(args)
+        if error_message:
+            return error_message
+
+        fields, error_message = get_fields(args, LIST_FIELDS)
+        if error_message:
+            return error_message
+
+        stream, error_message = get_stream_arg(args)
+        if error_message:
+            return error_message
+
+        query = shoppinglists_query(user_id, timestamp_filters)
+
+        # only the columns the response is made of, as plain rows
+        columns = fields + ('id', 'version')
+        if 'totals' in includes:
+            columns += LIST_TOTALS_COLUMNS
+        list_columns = select_columns(Shoppinglists, columns)
+
+        if stream:
+            # every shoppinglist, read and sent a chunk at a time
+            return stream_response(stream_lists(
+                query.with_entities(*list_columns), includes, fields))
+
+        if 'q' in args:
+            # search for shoppinglists that contain keyword provided
+            keyword = str(args['q']).lower()
+
+            # most relevant matches first
+            query = search(query, Shoppinglists.title, keyword)
             if limit:
-                # Limit number of shoppinglists returned
-                shopping_lists = Shoppinglists.query.filter_by(
-                    user_id=user_id).limit(limit)
-            else:
-                # Retrieve all shoppinglists
-                shopping_lists = Shoppinglists.query.filter_by(
-                    user_id=user_id).all()
-
-        data = []
-        for shopping_list in shopping_lists:
-            list_details = {
-                'id': shopping_list.id,
-                'title': shopping_list.title,
-                'created_on': shopping_list.created_on,
-                'modified_on': shopping_list.modified_on
+                # search with pagination
+                query = query.limit(limit)
+
+        def fetch_page(page_query):
+            if 'q' in args:
+                return page_query.all(), None
+            # retrieve a page of shoppinglists ordered by id
+            return paginate(page_query, Shoppinglists.id, limit, after_id)
+
+        if request.if_none_match:
+            # revalidate with the IDs and versions of the page alone
+            versions, next_cursor = fetch_page(query.with_entities(
+                Shoppinglists.id, Shoppinglists.version))
+            etag = page_etag(versions, next_cursor)
+            if is_not_modified(etag):
+                return not_modified_response(cache_headers(etag))
+
+        shopping_lists, next_cursor = fetch_page(
+            query.with_entities(*list_columns))
+
+        if 'q' in args and len(shopping_lists) < 1:
+            data = {
+                'error_msg': "No shoppinglist matches "
+                             "the keyword `{}`.".format(keyword)
             }
-            data.append(list_details)
-        return make_response(data, status_code=200)
+            return make_response(data, 404)
+
+        list_items = None
+        if 'items' in includes:
+            # the items of the whole page, with a single query
+            list_items = get_list_items(
+                [shopping_list.id for shopping_list in shopping_lists])
+
+        data = [describe_list(shopping_list, includes, list_items, fields)
+                for shopping_list in shopping_lists]
+
+        headers = pagination_headers(next_cursor)
+        headers.update(cache_headers(page_etag(
+            ((shopping_list.id, shopping_list.version)
+             for shopping_list in shopping_lists), next_cursor)))
+        return make_response(data, status_code=200, headers=headers)
 
     @flask_api.route('/shoppinglist/<int:list_id>',
                      methods=['PUT', 'GET', 'DELETE'])
     @token_auth.login_required
     def shoppinglist(list_id):
-        user_id = user_logged_in.id
+        user_id = g.user.id
+
+        includes, error_message = get_includes(request.args)
+        if error_message:
+            return error_message
+
+        fields, error_message = get_fields(request.args, LIST_FIELDS)
+        if error_message:
+            return error_message
 
         # check if shoppinglist with id <list_id> exists
-        shopping_list = Shoppinglists.query.filter_by(id=list_id,
-                                                      user_id=user_id).first()
+        query = shoppinglist_query(list_id, user_id)
+        if request.method == 'GET':
+            # only the columns the response is made of, as a plain row
+            columns = fields + LIST_CACHE_COLUMNS
+            if 'totals' in includes:
+                columns += LIST_TOTALS_COLUMNS
+            query = query.with_entities(
+                *select_columns(Shoppinglists, columns))
+        shopping_list = lock_for_conditional_write(query).first()
         if not shopping_list:
             data = {
                 'error_msg': "Requested shoppinglist was not found"
             }
             return make_response(data, status_code=404)
 
+        headers = list_cache_headers(shopping_list)
+        if is_not_modified(headers['ETag']):
+            return not_modified_response(headers)
+        if precondition_failed(headers['ETag']):
+            return precondition_failed_response()
+
         if request.method == 'PUT':
             title = str(request.data.get('title', '')).lower().strip()
 
@@ -360,21 +510,21 @@ def create_app(config_mode):
             if error_message:
                 return error_message
 
-            # get current timestamp
-            epoch_time = time.time()
-            timestamp = datetime.datetime.fromtimestamp(epoch_time).strftime(
-                '%Y-%m-%d %H:%M:%S')
-
             shopping_list.title = title
-            shopping_list.modified_on = timestamp
-            shopping_list.save()
+            shopping_list.modified_on = utcnow()
+            shopping_list.version = Shoppinglists.version + 1
+            error_message = save_unique(
+                shopping_list, "`{}` already exists".format(title))
+            if error_message:
+                return error_message
 
             data = {
                 'id': shopping_list.id,
                 'title': shopping_list.title,
-                'modified_on': shopping_list.modified_on
+                'modified_on': format_timestamp(shopping_list.modified_on)
             }
-            return make_response(data, 200)
+            return make_response(data, 200,
+                                 headers=list_cache_headers(shopping_list))
 
         if request.method == 'DELETE':
             shopping_list.delete()
@@ -385,27 +535,47 @@ def create_app(config_mode):
             return make_response(data, status_code=200)
 
         # retrieve the list with the id provided
-        list_details = {
-            'id': shopping_list.id,
-            'title': shopping_list.title,
-            'modified_on': shopping_list.modified_on,
-            'created_on': shopping_list.created_on
-        }
-        return make_response(list_details, status_code=200)
+        list_items = None
+        if 'items' in includes:
+            list_items = get_list_items([list_id])
+        list_details = describe_list(shopping_list, includes, list_items,
+                                     fields)
+        return make_response(list_details, status_code=200, headers=headers)
 
     @flask_api.route('/shoppinglist/<int:list_id>/items/',
-                     methods=['POST', 'GET'])
+                     methods=['POST', 'GET', 'PATCH', 'DELETE'])
     @token_auth.login_required
     def shoppinglist_items(list_id):
 
-        user_id = user_logged_in.id
-        shopping_list = Shoppinglists.query.filter_by(id=list_id,
-                                                      user_id=user_id).first()
+        fields, error_message = get_fields(request.args, ITEM_FIELDS)
+        if error_message:
+            return error_message
+
+        user_id = g.user.id
+        shopping_list = lock_for_conditional_write(
+            shoppinglist_query(list_id, user_id)).first()
         if not shopping_list:
             data = {'error_msg': "Requested shoppinglist was not found"}
             return make_response(data, status_code=404)
 
+        # the items change with the list's version
+        headers = list_cache_headers(shopping_list)
+        if is_not_modified(headers['ETag']):
+            return not_modified_response(headers)
+        if precondition_failed(headers['ETag']):
+            return precondition_failed_response()
+
+        if request.method == 'PATCH':
+            return update_items(list_id, request.data)
+
+        if request.method == 'DELETE':
+            return delete_items(list_id, request.data)
+
         if request.method == 'POST':
+            if isinstance(request.data, list):
+                # several items sent as a JSON array
+                return create_items(list_id, request.data)
+
             # Create shoppinglist item with the name provided
             name = str(request.data.get('name', '')).lower().strip()
             price = str(request.data.get('price', ''))
@@ -415,107 +585,114 @@ def create_app(config_mode):
                     price, quantity)
 
             if not error_message:
-                data = [name, price, quantity]
-                error_message = validate_item_name(data, list_id)
+                error_message = validate_item_name(name)
 
             if error_message:
                 return error_message
 
+            # the database rejects an item identical to an existing one
             item = ShoppingListItems(name=name, shoppinglist_id=list_id,
                                      price=price, quantity=quantity)
-            item.save()
-            data = {
-                'id': item.id,
-                'name': item.name,
-                'price': item.price,
-                'quantity': item.quantity
-            }
-            return make_response(data, status_code=201)
+            record_item_changes(list_id, added=1,
+                                cost=float(price) * float(quantity))
+            error_message = save_unique(
+                item, "Item `{}` already exists".format(name))
+            if error_message:
+                return error_message
+
+            return make_response(describe_item(item), status_code=201)
 
         # METHOD GET
 
-        items = None
-        limit = None
+        next_cursor = None
 
         # check if a search keyword has been provided
         args = request.args
-        if args:
+        limit, after_id, error_message = get_pagination_args(args)
+        if error_message:
+            return error_message
 
-            if 'limit' in args:
-                # limit number of results returned
-                limit = int(args['limit'])
+        stream, error_message = get_stream_arg(args)
+        if error_message:
+            return error_message
 
-            if 'q' in args:
-                # search for item that contain keyword provided
-                keyword = str(args['q']).lower()
-
-                if limit:
-                    # limit number of results returned
-                    items = ShoppingListItems.query.filter(
-                        ShoppingListItems.name.like(
-                            "%{}%".format(keyword)),
-                        ShoppingListItems.shoppinglist_id == list_id
-                    ).limit(limit).all()
-
-                else:
-                    # get all results that match keyword
-                    items = ShoppingListItems.query.filter(
-                        ShoppingListItems.name.like(
-                            "%{}%".format(keyword)
-                        ), ShoppingListItems.shoppinglist_id == list_id
-                    ).all()
-
-                # if no items contains keyword
-                if len(items) < 1:
-                    data = {'error_msg': "No item matches the keyword "
-                                         "`{}`.".format(keyword)}
-                    return make_response(data, status_code=404)
-
-        if not items:
+        query = items_query(list_id)
+
+        # only the columns the response is made of, as plain rows
+        item_columns = select_columns(ShoppingListItems, fields + ('id',))
+
+        if stream:
+            # every item, read and sent a chunk at a time
+            return stream_response(stream_items(
+                query.with_entities(*item_columns), fields), headers=headers)
+
+        if 'q' in args:
+            # search for item that contain keyword provided
+            keyword = str(args['q']).lower()
 
+            # most relevant matches first
+            query = search(query, ShoppingListItems.name, keyword)
             if limit:
-                # limit number or results to be returned
-                items = ShoppingListItems.query.filter_by(
-                    shoppinglist_id=list_id).limit(limit).all()
-            else:
-                #  return all results
-                items = ShoppingListItems.query.filter_by(
-                    shoppinglist_id=list_id)
-
-        data = []
-        for item in items:
-            list_details = {
-                'id': item.id,
-                'name': item.name,
-                'price': item.price,
-                'quantity': item.quantity
-            }
-            data.append(list_details)
-        return make_response(data, status_code=200)
+                # limit number of results returned
+                query = query.limit(limit)
+            items = query.with_entities(*item_columns).all()
+
+            # if no items contains keyword
+            if len(items) < 1:
+                data = {'error_msg': "No item matches the keyword "
+                                     "`{}`.".format(keyword)}
+                return make_response(data, status_code=404)
+
+        else:
+            # retrieve a page of items ordered by id
+            items, next_cursor = paginate(query.with_entities(*item_columns),
+                                          ShoppingListItems.id, limit,
+                                          after_id)
+
+        data = [describe_item(item, fields) for item in items]
+
+        headers.update(pagination_headers(next_cursor))
+        return make_response(data, status_code=200, headers=headers)
 
     @flask_api.route('/items/<int:item_id>',
                      methods=['PUT', 'GET', 'DELETE'])
     @token_auth.login_required
     def shoppinglist_item(item_id):
 
-        item = ShoppingListItems.query.filter_by(
-            id=item_id).first()
+        fields, error_message = get_fields(request.args, ITEM_FIELDS)
+        if error_message:
+            return error_message
+
+        # load the item together with its list, and only if the list belongs
+        # to the current user, in a single query
+        load_list = contains_eager(ShoppingListItems.shoppinglists)
+        query = item_query(item_id, g.user.id)
+        if request.method == 'GET':
+            # only the columns the response and its headers are made of
+            query = query.options(load_only(*fields),
+                                  load_list.load_only(*LIST_CACHE_COLUMNS))
+        else:
+            query = query.options(load_list)
+        item = lock_for_conditional_write(query).first()
 
         if not item:
             data = {'error_msg': "Requested shoppinglist item was not found"}
             return make_response(data=data, status_code=404)
 
-        shoppinglist_id = item.shoppinglist_id
+        # the item changes with its list's version
+        headers = list_cache_headers(item.shoppinglists)
+        if is_not_modified(headers['ETag']):
+            return not_modified_response(headers)
+        if precondition_failed(headers['ETag']):
+            return precondition_failed_response()
 
         if request.method == 'PUT':
             name = str(request.data.get('name', '')).lower().strip()
             price = str(request.data.get('price', ''))
             quantity = str(request.data.get('quantity', ''))
 
-            data = [name, price, quantity]
-
             # check if item name is valid
-            error_message = validate_item_name(data, shoppinglist_id)
+            error_message = validate_item_name(name)
 
             if not error_message:
                 error_message = validate_item_price_and_quantity(
@@ -524,52 +701,568 @@ def create_app(config_mode):
             if error_message:
                 return error_message
 
+            record_item_changes(
+                item.shoppinglist_id,
+                cost=float(price) * float(quantity) - item.price *
+                item.quantity)
             item.name = name
             item.price = price
             item.quantity = quantity
-            item.save()
+            error_message = save_unique(
+                item, "Item `{}` already exists".format(name))
+            if error_message:
+                return error_message
 
             data = {'id': item.id, 'name': item.name}
-            return make_response(data=data, status_code=200)
+            return make_response(
+                data=data, status_code=200,
+                headers=list_cache_headers(item.shoppinglists))
 
         if request.method == 'DELETE':
+            record_item_changes(item.shoppinglist_id, added=-1,
+                                cost=-item.price * item.quantity)
             item.delete()
             data = {"message": "item {} has been deleted "
                                "successfully".format(item_id)}
             return make_response(data=data, status_code=200)
 
-        # retrieve the list with the id provided
-        data = {
-            'id': item.id,
-            'name': item.name,
-            'price': item.price,
-            'quantity': item.quantity
-        }
-        return make_response(data, status_code=200)
+        # retrieve the item with the id provided
+        return make_response(describe_item(item, fields), status_code=200,
+                             headers=headers)
 
     return flask_api
 
 
-def make_response(data, status_code):
+def make_response(data, status_code, headers=None):
     """Convert dictionary provided to a json array and adds a status code to
-    the dictionary
+    the dictionary. The body is serialised by `json_serializer`
 
         :arg:
             data (dict): Dictionary to be converted to json array
             status_code (int):
+            headers (dict): Extra headers to add to the response
 
         :return
             response (json):
     """
-    response = jsonify(data)
-    response.status_code = status_code
+    response = current_app.response_class(json_serializer.dumps(data),
+                                          status=status_code,
+                                          mimetype='application/json')
+    if headers:
+        response.headers.extend(headers)
     return response
 
 
+def stream_response(chunks, headers=None):
+    """Creates a response whose body, a JSON array, is serialised and sent
+    while its elements are still being read, so that its size is not bounded
+    by the memory of the worker. Arrays of fewer than `STREAM_MIN_ROWS`
+    elements are sent in one piece instead, which takes less memory for
+    them than streaming
+
+        :arg:
+            chunks (iterable): Lists of the array's elements
+            headers (dict): Extra headers to add to the response
+
+        :return
+            response (json):
+    """
+    # read far enough to tell if the array is worth streaming
+    chunks = iter(chunks)
+    read = []
+    rows = 0
+    while rows < current_app.config['STREAM_MIN_ROWS']:
+        chunk = next(chunks, None)
+        if chunk is None:
+            return make_response([element for chunk in read
+                                  for element in chunk],
+                                 status_code=200, headers=headers)
+        read.append(chunk)
+        rows += len(chunk)
+
+    def resume():
+        # the chunks already read, then the rest
+        try:
+            for chunk in read:
+                yield chunk
+            del read[:]
+            for chunk in chunks:
+                yield chunk
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    response = current_app.response_class(
+        stream_with_context(json_serializer.dumps_array(resume())),
+        mimetype='application/json')
+    if headers:
+        response.headers.extend(headers)
+    return response
+
+
+def precondition_failed_response():
+    """Creates the response to a write whose `If-Match` header names an
+    outdated version of the resource
+
+        :return
+            response (json): Error message
+    """
+    data = {
+        'error_msg': "The shoppinglist has changed since it was read, "
+                     "please retrieve it and try again"
+    }
+    return make_response(data, status_code=412)
+
+
+def list_cache_headers(shopping_list):
+    """Creates the `ETag` and `Last-Modified` headers of the resources that
+    change with a shoppinglist: the list itself, its items and each of its
+    items
+
+        :arg:
+            shopping_list (object): Shoppinglist
+
+        :return
+            (dict): Headers
+    """
+    last_modified = max(shopping_list.modified_on,
+                        shopping_list.last_item_change or
+                        shopping_list.modified_on)
+    return cache_headers(list_etag(shopping_list.id, shopping_list.version),
+                         last_modified)
+
+
+def get_pagination_args(args):
+    """Reads and validates the `limit` and `cursor` query parameters
+
+        :arg:
+            args (dict): Query parameters of the request
+
+        :return
+            (tuple): Maximum number of results (None for all), ID after which
+            the page starts (None for the first page) and an error response
+            if the parameters are invalid, otherwise None
+    """
+    limit = None
+    after_id = None
+
+    if 'limit' in args:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            limit = 0
+
+        # one row more than the limit is fetched, and must still be
+        # expressible as a 64-bit LIMIT
+        if not 1 <= limit < MAX_ID:
+            data = {
+                'error_msg': "Please provide a valid limit"
+            }
+            return None, None, make_response(data, status_code=400)
+
+    if 'cursor' in args:
+        if 'q' in args:
+            data = {
+                'error_msg': "Search results are ranked and cannot be paged "
+                             "with a cursor"
+            }
+            return None, None, make_response(data, status_code=400)
+
+        after_id = decode_cursor(str(args['cursor']))
+        if after_id is None:
+            data = {
+                'error_msg': "Please provide a valid cursor"
+            }
+            return None, None, make_response(data, status_code=400)
+
+    return limit, after_id, None
+
+
+def get_timestamp_filters(args):
+    """Reads and validates the `modified_since` and `created_before` query
+    parameters
+
+        :arg:
+            args (dict): Query parameters of the request
+
+        :return
+            (tuple): Filters to apply to the shoppinglists query and an error
+            response if the parameters are invalid, otherwise None
+    """
+    filters = []
+    parameters = (
+        ('modified_since', operator.gt, Shoppinglists.modified_on),
+        ('created_before', operator.lt, Shoppinglists.created_on),
+    )
+    for name, comparison, column in parameters:
+        if name not in args:
+            continue
+
+        timestamp = parse_timestamp(str(args[name]))
+        if timestamp is None:
+            data = {
+                'error_msg': "Please provide a valid `{}` timestamp, "
+                             "e.g. 2017-10-12T10:40:32Z".format(name)
+            }
+            return None, make_response(data, status_code=400)
+        filters.append(comparison(column, timestamp))
+
+    return filters, None
+
+
+def get_includes(args):
+    """Reads and validates the `include` query parameter, a comma separated
+    list of the details to add to each shoppinglist returned
+
+        :arg:
+            args (dict): Query parameters of the request
+
+        :return
+            (tuple): Set of details requested and an error response if one of
+            them is unknown, otherwise None
+    """
+    includes = set(name.strip() for name in
+                   str(args.get('include', '')).split(',') if name.strip())
+
+    unknown = includes.difference(LIST_INCLUDES)
+    if unknown:
+        data = {
+            'error_msg': "Cannot include `{}`, choose from {}".format(
+                '`, `'.join(sorted(unknown)),
+                ', '.join('`{}`'.format(name) for name in LIST_INCLUDES))
+        }
+        return None, make_response(data, status_code=400)
+
+    return includes, None
+
+
+def shoppinglists_query(user_id, filters=()):
+    """Builds the query for the shoppinglists of a user
+
+        :arg:
+            user_id (int): ID of the user
+            filters (list): Further filters, e.g. from get_timestamp_filters
+
+        :return
+            (object): Query of the shoppinglists
+    """
+    return Shoppinglists.query.filter_by(user_id=user_id).filter(*filters)
+
+
+def shoppinglist_query(list_id, user_id):
+    """Builds the query for a shoppinglist, found only if it belongs to the
+    user
+
+        :arg:
+            list_id (int): ID of the shoppinglist
+            user_id (int): ID of the user
+
+        :return
+            (object): Query of the shoppinglist
+    """
+    return Shoppinglists.query.filter_by(id=list_id, user_id=user_id)
+
+
+def items_query(list_id):
+    """Builds the query for the items of a shoppinglist
+
+        :arg:
+            list_id (int): ID of the shoppinglist, already checked to belong
+                to the current user
+
+        :return
+            (object): Query of the items
+    """
+    return ShoppingListItems.query.filter_by(shoppinglist_id=list_id)
+
+
+def item_query(item_id, user_id):
+    """Builds the query for an item joined to its shoppinglist, found only if
+    the shoppinglist belongs to the user
+
+        :arg:
+            item_id (int): ID of the item
+            user_id (int): ID of the user
+
+        :return
+            (object): Query of the item
+    """
+    return ShoppingListItems.query.join(
+        ShoppingListItems.shoppinglists).filter(
+        ShoppingListItems.id == item_id, Shoppinglists.user_id == user_id)
+
+
+def existing_items_query(list_id, names):
+    """Builds the query for the identities of the items of a shoppinglist
+    that have one of several names
+
+        :arg:
+            list_id (int): ID of the shoppinglist
+            names (set): Names of the items
+
+        :return
+            (object): Query of the name, price and quantity of the items
+    """
+    return db.session.query(
+        ShoppingListItems.name, ShoppingListItems.price,
+        ShoppingListItems.quantity).filter(
+        ShoppingListItems.shoppinglist_id == list_id,
+        ShoppingListItems.name.in_(names))
+
+
+def get_stream_arg(args):
+    """Reads and validates the `stream` query parameter, which asks for the
+    whole collection to be sent as it is read
+
+        :arg:
+            args (dict): Query parameters of the request
+
+        :return
+            (tuple): True if the response should be streamed and an error
+            response if the request also searches or pages, otherwise None
+    """
+    if str(args.get('stream', '')).lower() not in ('1', 'true'):
+        return False, None
+
+    conflicting = [name for name in ('q', 'limit', 'cursor') if name in args]
+    if conflicting:
+        data = {
+            'error_msg': "A streamed response holds the whole collection and "
+                         "cannot be combined with `{}`".format(
+                             '`, `'.join(conflicting))
+        }
+        return None, make_response(data, status_code=400)
+
+    return True, None
+
+
+def get_fields(args, available):
+    """Reads and validates the `fields` query parameter, a comma separated
+    list of the fields to return of each shoppinglist or item
+
+        :arg:
+            args (dict): Query parameters of the request
+            available (tuple): Fields that can be requested
+
+        :return
+            (tuple): Fields requested in the order given, all of them if none
+            are, and an error response if one of them is unknown, otherwise
+            None
+    """
+    fields = []
+    for name in str(args.get('fields', '')).split(','):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        data = {
+            'error_msg': "Cannot select field `{}`, choose from {}".format(
+                '`, `'.join(unknown),
+                ', '.join('`{}`'.format(name) for name in available))
+        }
+        return None, make_response(data, status_code=400)
+
+    return tuple(fields) or available, None
+
+
+def select_columns(model, names):
+    """Picks the columns of a model to select, e.g. with `with_entities`
+
+        :arg:
+            model (object): Model owning the columns
+            names (tuple): Names of the columns, possibly repeated
+
+        :return
+            (list): Model attributes, in a stable order
+    """
+    return [getattr(model, name) for name in sorted(set(names))]
+
+
+def describe_fields(row, fields):
+    """Reads fields of a row for a response
+
+        :arg:
+            row (object): Entity, or a row with the columns of the fields
+            fields (tuple): Names of the fields
+
+        :return
+            (dict): Value of each field, with timestamps formatted
+    """
+    details = {}
+    for field in fields:
+        value = getattr(row, field)
+        if isinstance(value, datetime):
+            value = format_timestamp(value)
+        details[field] = value
+    return details
+
+
+def describe_list(shopping_list, includes, list_items=None,
+                  fields=LIST_FIELDS):
+    """Creates the representation of a shoppinglist
+
+        :arg:
+            shopping_list (object): Shoppinglist, or a row with the columns
+                of its fields and details
+            includes (set): Details to add, see get_includes
+            list_items (dict): Items keyed by shoppinglist ID, as loaded by
+                get_list_items, if `items` are included
+            fields (tuple): Fields of the shoppinglist to return
+
+        :return
+            (dict): Details of the shoppinglist
+    """
+    list_details = describe_fields(shopping_list, fields)
+    if 'totals' in includes:
+        list_details.update(get_list_totals(shopping_list))
+    if 'items' in includes:
+        list_details['items'] = list_items[shopping_list.id]
+    return list_details
+
+
+def describe_item(item, fields=ITEM_FIELDS):
+    """Creates the representation of a shoppinglist item
+
+        :arg:
+            item (object): Item, or a row with the columns of its fields
+            fields (tuple): Fields of the item to return
+
+        :return
+            (dict): Details of the item
+    """
+    return describe_fields(item, fields)
+
+
+def stream_lists(query, includes, fields=LIST_FIELDS):
+    """Reads shoppinglists a chunk at a time, for stream_response
+
+        :arg:
+            query (object): Query of the shoppinglists
+            includes (set): Details to add, see get_includes
+            fields (tuple): Fields of each shoppinglist to return
+
+        :return
+            (generator): Lists of shoppinglist details
+    """
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    for shopping_lists in iter_chunks(query, Shoppinglists.id, chunk_size):
+        list_items = None
+        if 'items' in includes:
+            # the items of the whole chunk, with a single query
+            list_items = get_list_items(
+                [shopping_list.id for shopping_list in shopping_lists])
+        yield [describe_list(shopping_list, includes, list_items, fields)
+               for shopping_list in shopping_lists]
+
+
+def stream_items(query, fields=ITEM_FIELDS):
+    """Reads shoppinglist items a chunk at a time, for stream_response
+
+        :arg:
+            query (object): Query of the items
+            fields (tuple): Fields of each item to return
+
+        :return
+            (generator): Lists of item details
+    """
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    for items in iter_chunks(query, ShoppingListItems.id, chunk_size):
+        yield [describe_item(item, fields) for item in items]
+
+
+def get_list_totals(shopping_list):
+    """Reports the item count and total cost kept on a shoppinglist
+
+        :arg:
+            shopping_list (object): Shoppinglist to report on
+
+        :return
+            (dict): `item_count`, `total` (sum of price times quantity) and
+            `last_item_change` of the shoppinglist
+    """
+    return {
+        'item_count': shopping_list.item_count,
+        'total': shopping_list.total_cost,
+        'last_item_change': format_timestamp(shopping_list.last_item_change)
+    }
+
+
+def get_list_items(list_ids):
+    """Loads the items of several shoppinglists with a single query
+
+        :arg:
+            list_ids (list): IDs of the shoppinglists
+
+        :return
+            (dict): Items of each shoppinglist in id order, keyed by the
+            shoppinglist's ID
+    """
+    list_items = {list_id: [] for list_id in list_ids}
+    if not list_ids:
+        return list_items
+
+    rows = db.session.query(
+        ShoppingListItems.shoppinglist_id, ShoppingListItems.id,
+        ShoppingListItems.name, ShoppingListItems.price,
+        ShoppingListItems.quantity
+    ).filter(
+        ShoppingListItems.shoppinglist_id.in_(list_ids)
+    ).order_by(ShoppingListItems.shoppinglist_id, ShoppingListItems.id)
+
+    for row in rows:
+        list_items[row.shoppinglist_id].append(describe_item(row))
+    return list_items
+
+
+def record_item_changes(list_id, added=0, cost=0):
+    """Adjusts the item count and total cost kept on a shoppinglist when its
+    items change. The UPDATE joins the transaction of the item changes, which
+    the caller commits
+
+        :arg:
+            list_id (int): ID of the shoppinglist
+            added (int): Number of items added, negative when removed
+            cost (float): Change in the total cost of the items
+    """
+    Shoppinglists.query.filter_by(id=list_id).update({
+        Shoppinglists.item_count: Shoppinglists.item_count + added,
+        Shoppinglists.total_cost: Shoppinglists.total_cost + cost,
+        Shoppinglists.last_item_change: utcnow(),
+        Shoppinglists.version: Shoppinglists.version + 1
+    }, synchronize_session=False)
+
+
+def recompute_list_totals(lists_query, **values):
+    """Recomputes the item count and total cost kept on shoppinglists from
+    their items with a single UPDATE statement, for changes whose effect on
+    the totals is not known up front and to repair drift
+
+        :arg:
+            lists_query (object): Query of the shoppinglists to recompute
+            values (dict): Other columns to set on the shoppinglists
+
+        :return
+            (int): Number of shoppinglists updated
+    """
+    items = db.session.query(ShoppingListItems).filter(
+        ShoppingListItems.shoppinglist_id == Shoppinglists.id)
+    values.update({
+        'version': Shoppinglists.version + 1,
+        'item_count': items.with_entities(
+            db.func.count(ShoppingListItems.id)).as_scalar(),
+        'total_cost': items.with_entities(db.func.coalesce(
+            db.func.sum(ShoppingListItems.price * ShoppingListItems.quantity),
+            0)).as_scalar()
+    })
+    return lists_query.update(values, synchronize_session=False)
+
+
 def validate_title(title):
-    """Validates that a title has the at-least one character and that no
-        other shoppinglist - belonging to the current user - has a similar
-        title
+    """Validates that a title has the at-least one character. Duplicate
+    titles are rejected by the database when the shoppinglist is saved
 
         :arg:
             title (string): The title of shoppinglist to be created
@@ -578,104 +1271,345 @@ def validate_title(title):
             response (json): Error message generated if any, otherwise
             returns None
     """
-    user_id = user_logged_in.id
-
     if not title:
         data = {
             'error_msg': "shoppinglist title must be provided"
         }
         return make_response(data, status_code=400)
 
-    # check if similar shoppinglist owned by same user exists
-    if Shoppinglists.query.filter_by(title=title,
-                                     user_id=user_id).first():
+
+def save_unique(instance, error_message):
+    """Saves a shoppinglist or item, turning a violation of its unique
+    constraint into a conflict response
+
+        :arg:
+            instance (object): Shoppinglist or item to be saved
+            error_message (string): Message returned if an identical
+                shoppinglist or item already exists
+
+        :return
+            response (json): Error message generated if any, otherwise
+            returns None
+    """
+    try:
+        instance.save()
+    except IntegrityError:
+        db.session.rollback()
         data = {
-            'error_msg': "`{}` already exists".format(title)
+            'error_msg': error_message
         }
         return make_response(data, status_code=409)
 
 
-def validate_item_name(data, list_id):
-    """Validates that a name has the at-least one character and that no
-    other item - belonging to the current user - has a similar name
+def validate_item_name(name):
+    """Validates that a name has the at-least one character. Items identical
+    to an existing one are rejected by the database when the item is saved
 
         :arg:
-            data (array): An array containing the name, price and quantity of item to be created
-            list_id (int): ID of the shoppinglist where item will be created
+            name (string): The name of item to be created
 
         :return
             response (json): Error message generated if any, otherwise
             returns None
     """
 
-    if not data[0]:
+    if not name:
         data = {
             'error_msg': "Item name must be provided"
         }
         return make_response(data, status_code=400)
 
-    if ShoppingListItems.query.filter_by(
-            name=data[0], price=data[1], quantity=data[2], shoppinglist_id=list_id).first():
-        data = {
-            'error_msg': "Item `{}` already exists".format(data[0])
-        }
-        return make_response(data, status_code=409)
-
 
 def validate_item_price_and_quantity(price, quantity):
-    """Validates that a name has the at-least one character and that no
-    other item - belonging to the current user - has a similar name
+    """Validates that the price and quantity of an item are numbers
 
         :arg:
-            name (string): The name of item to be created
-            list_id (int): ID of the shoppinglist where item will be created
+            price (string): Price of the item
+            quantity (string): Quantity of the item
 
         :return
             response (json): Error message generated if any, otherwise
             returns None
     """
-
-    try:
-        float(price)
-    except ValueError:
+    error_message = price_and_quantity_error(price, quantity)
+    if error_message:
         data = {
-            'error_msg': "Please provide a valid item price"
+            'error_msg': error_message
         }
         return make_response(data, status_code=400)
 
+
+def price_and_quantity_error(price, quantity):
+    """Checks that the price and quantity of an item are finite numbers. A
+    `nan` or `inf` would be added to the totals of the item's list and stay
+    there until they are repaired
+
+        :arg:
+            price (string): Price of the item
+            quantity (string): Quantity of the item
+
+        :return
+            (string): Error message if either is invalid, otherwise None
+    """
+    try:
+        if not math.isfinite(float(price)):
+            raise ValueError(price)
+    except ValueError:
+        return "Please provide a valid item price"
+
     try:
-        float(quantity)
+        if not math.isfinite(float(quantity)):
+            raise ValueError(quantity)
     except ValueError:
+        return "Please provide a valid quantity"
+
+
+def create_items(list_id, entries):
+    """Creates several items in a shoppinglist. Duplicates are looked up with
+    one query for the whole batch, and the new items are inserted together
+    and committed once
+
+        :arg:
+            list_id (int): ID of the shoppinglist where items will be created
+            entries (list): Items to create, each with a name, a price and
+                optionally a quantity
+
+        :return
+            response (json): Result of every item, in the order provided. The
+            status is 201 if all items were created, the status shared by
+            all items if none was, otherwise 207
+    """
+    max_items = current_app.config['MAX_BULK_ITEMS']
+    if not entries:
         data = {
-            'error_msg': "Please provide a valid quantity"
+            'error_msg': "Please provide at least one item"
         }
         return make_response(data, status_code=400)
 
+    if len(entries) > max_items:
+        data = {
+            'error_msg': "At most {} items can be created at "
+                         "once".format(max_items)
+        }
+        return make_response(data, status_code=413)
+
+    results = []
+    candidates = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            results.append({'status': 400,
+                            'error_msg': "Each item must be an object"})
+            continue
+
+        name = str(entry.get('name', '')).lower().strip()
+        price = str(entry.get('price', ''))
+        quantity = str(entry.get('quantity', 1))
+
+        if not name:
+            error_message = "Item name must be provided"
+        else:
+            error_message = price_and_quantity_error(price, quantity)
+        if error_message:
+            results.append({'status': 400, 'error_msg': error_message})
+            continue
+
+        result = {'status': 201, 'name': name, 'price': float(price),
+                  'quantity': float(quantity)}
+        results.append(result)
+        candidates.append(result)
+
+    # look up the items that already exist with a single query
+    existing = set()
+    if candidates:
+        existing = set(existing_items_query(
+            list_id, {result['name'] for result in candidates}))
+
+    rows = []
+    for result in candidates:
+        identity = (result['name'], result['price'], result['quantity'])
+        if identity in existing:
+            # also catches an item repeated within the batch
+            result.clear()
+            result.update({'status': 409,
+                           'error_msg': "Item `{}` already "
+                                        "exists".format(identity[0])})
+            continue
+
+        existing.add(identity)
+        row = dict(result, id=id_generator.next_id(),
+                   shoppinglist_id=list_id)
+        del row['status']
+        rows.append((result, row))
+
+    if rows:
+        # IDs assigned by the database have to be read back row by row
+        assign_ids = rows[0][1]['id'] is None
+        if assign_ids:
+            for result, row in rows:
+                del row['id']
+        try:
+            record_item_changes(
+                list_id, added=len(rows),
+                cost=sum(row['price'] * row['quantity']
+                         for result, row in rows))
+            db.session.bulk_insert_mappings(
+                ShoppingListItems, [row for result, row in rows],
+                return_defaults=assign_ids)
+            db.session.commit()
+        except IntegrityError:
+            # an identical item was added by a concurrent request
+            db.session.rollback()
+            data = {
+                'error_msg': "Items were added to the shoppinglist at the "
+                             "same time, please try again"
+            }
+            return make_response(data, status_code=409)
+        for result, row in rows:
+            result['id'] = row['id']
 
-def sha1_hash(value):
-    """Calculates the SHA1 has of a string
+    statuses = {result['status'] for result in results}
+    status_code = statuses.pop() if len(statuses) == 1 else 207
+    return make_response(results, status_code=status_code)
 
-            :arg:
-                value (str): String to be hashed
 
-            :return
-                (str): SHA1 hash
-        """
+def read_item_fields(fields):
+    """Validates the item fields of a bulk filter or change set
 
-    # add salt to the value
-    salt = "!@3`tHy:'hj6^&7m4qG9[6"
-    salted_value = value + salt
+        :arg:
+            fields (dict): Any of an item's name, price and quantity
 
-    # convert string to bytes
-    value = str.encode(salted_value)
+        :return
+            (tuple): The fields converted to the columns' types and an error
+            message if they are invalid, otherwise None
+    """
+    if not isinstance(fields, dict) or not fields:
+        return None, "Please provide the item's name, price or quantity"
+
+    unknown_fields = set(fields) - {'name', 'price', 'quantity'}
+    if unknown_fields:
+        return None, "Unknown item fields: {}".format(
+            ', '.join(sorted(unknown_fields)))
+
+    values = {}
+    if 'name' in fields:
+        values['name'] = str(fields['name']).lower().strip()
+        if not values['name']:
+            return None, "Item name must be provided"
+
+    error_message = price_and_quantity_error(str(fields.get('price', 0)),
+                                             str(fields.get('quantity', 1)))
+    if error_message:
+        return None, error_message
+    for field in ('price', 'quantity'):
+        if field in fields:
+            values[field] = float(fields[field])
+    return values, None
+
+
+def select_items(list_id, data):
+    """Builds the query for the items of a shoppinglist that a bulk update or
+    delete applies to
+
+        :arg:
+            list_id (int): ID of the shoppinglist, already checked to belong
+                to the current user
+            data (dict): Request body, with either the `ids` of the items or
+                a `filter` on their name, price and quantity. An empty filter
+                selects all the items
+
+        :return
+            (tuple): Query of the selected items and an error response if
+            the selection is invalid, otherwise None
+    """
+    query = items_query(list_id)
+    error_message = "Please provide the `ids` of the items or a `filter`"
 
-    # calculate a SHA1 hash
-    hash_object = hashlib.sha1(value)
-    hashed_value = hash_object.hexdigest()
-    return hashed_value
+    if isinstance(data, dict) and 'ids' in data:
+        ids = data['ids']
+        if (isinstance(ids, list) and ids and
+                len(ids) <= current_app.config['MAX_BULK_ITEMS'] and
+                all(is_valid_id(item_id) for item_id in ids)):
+            return query.filter(ShoppingListItems.id.in_(ids)), None
+        error_message = "Please provide a list of at most {} item " \
+                        "ids".format(current_app.config['MAX_BULK_ITEMS'])
 
+    elif isinstance(data, dict) and 'filter' in data:
+        if data['filter'] == {}:
+            # an empty filter selects every item, e.g. to clear the list
+            return query, None
 
-def generate_auth_token():
+        values, error_message = read_item_fields(data['filter'])
+        if not error_message:
+            return query.filter_by(**values), None
+
+    return None, make_response({'error_msg': error_message}, status_code=400)
+
+
+def update_items(list_id, data):
+    """Applies the same changes to several items of a shoppinglist with a
+    single UPDATE statement
+
+        :arg:
+            list_id (int): ID of the shoppinglist, already checked to belong
+                to the current user
+            data (dict): Request body, selecting the items like
+                `select_items` and holding the `changes` to make
+
+        :return
+            response (json): Number of items updated
+    """
+    query, error_response = select_items(list_id, data)
+    if error_response:
+        return error_response
+
+    changes, error_message = read_item_fields(data.get('changes'))
+    if error_message:
+        return make_response({'error_msg': error_message}, status_code=400)
+
+    # the database's unique constraint stops the changes from making two
+    # items of the list identical
+    try:
+        updated = query.update(changes, synchronize_session=False)
+        if updated:
+            recompute_list_totals(Shoppinglists.query.filter_by(id=list_id),
+                                  last_item_change=utcnow())
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        data = {
+            'error_msg': "The changes would make items of the shoppinglist "
+                         "identical"
+        }
+        return make_response(data, status_code=409)
+
+    return make_response({'updated': updated}, status_code=200)
+
+
+def delete_items(list_id, data):
+    """Deletes several items of a shoppinglist with a single DELETE statement
+
+        :arg:
+            list_id (int): ID of the shoppinglist, already checked to belong
+                to the current user
+            data (dict): Request body, selecting the items like
+                `select_items`
+
+        :return
+            response (json): Number of items deleted
+    """
+    query, error_response = select_items(list_id, data)
+    if error_response:
+        return error_response
+
+    deleted = query.delete(synchronize_session=False)
+    if deleted:
+        recompute_list_totals(Shoppinglists.query.filter_by(id=list_id),
+                              last_item_change=utcnow())
+    db.session.commit()
+    return make_response({'deleted': deleted}, status_code=200)
+
+
+def generate_auth_token(user):
     """Creates a user authentication token using the user's ID
 
         :arg:
@@ -684,24 +1618,87 @@ def generate_auth_token():
         :return
             (byte): Authentication token
     """
-    return serializer.dumps({'id': user_logged_in.id})
+    return serializer.dumps({'id': user.id, 'jti': uuid.uuid4().hex})
 
 
 @token_auth.verify_token
 def verify_auth_token(token):
     """Checks an authentication token to validate that it has a valid user's ID
-    and is not expired
+    and is not expired. The user identified is stored on `flask.g` for the
+    duration of the request
 
         :arg:
             token (string): Authentication token provided
 
         :return
-            (boolean): True if token is valid otherwise returns False
+            (object): User the token belongs to if token is valid otherwise
+            returns None
     """
+    entry = token_cache.get(token)
+    if entry is None:
+        try:
+            data, header = serializer.loads(token, return_header=True)
+        except (SignatureExpired, BadSignature):
+            return None  # invalid token
+
+        user = User.query.get(data['id'])
+        if not user:
+            return None
+
+        # keep a detached copy that stays valid until the token expires
+        db.session.expunge(user)
+        entry = (user, data.get('jti'))
+        token_cache.set(token, entry, expires_at=header.get('exp'))
+
+    user, jti = entry
+    if jti and revocation_store.is_revoked(jti):
+        return None
+
+    # attach a copy of the cached user to this request's session
+    # without querying the database
+    g.user = db.session.merge(user, load=False)
+    return g.user
+
+
+def revoke_auth_token(token):
+    """Revokes an authentication token so that it can no longer be used
+
+        :arg:
+            token (string): Authentication token to revoke
+
+        :return
+            (boolean): True if the token was valid and has been revoked
+    """
+    token_cache.delete(token)
     try:
-        data = serializer.loads(token)
+        data, header = serializer.loads(token, return_header=True)
     except (SignatureExpired, BadSignature):
-        return None  # invalid token
+        return False
+
+    if 'jti' not in data:
+        return False
+
+    revocation_store.revoke(data['jti'], header['exp'])
+    return True
+
 
-    user = User.query.get(data['id'])
-    return user
+def caches_unknown_usernames():
+    """Tells if logins may trust `unknown_usernames`. Registrations are only
+    shared between the workers of one host, through registration_log, so a
+    user registered on another host would be turned away for as long as a
+    failed login cached their name. With several hosts (`MULTI_HOST`),
+    every login of an unknown username reads the database instead
+
+        :return
+            (boolean): True if usernames found not to exist can be cached
+    """
+    return not current_app.config.get('MULTI_HOST')
+
+
+def invalidate_cached_user(user_id):
+    """Drops every cached token entry that resolves to the given user
+
+        :arg:
+            user_id (int): ID of the user whose cached details are stale
+    """
+    token_cache.invalidate(lambda entry: entry[0].id == user_id)
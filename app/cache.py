@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """A bounded, thread-safe, in-process cache whose entries expire.
+
+    Entries are evicted in least-recently-used order once `max_size` is
+    reached and are dropped once their expiry time has passed. Hit and miss
+    counters are kept so that the effectiveness of the cache can be checked.
+    """
+
+    def __init__(self, max_size=1024, ttl=900):
+        """Initialize the cache
+
+            :arg:
+                max_size (int): Maximum number of entries kept
+                ttl (int): Default lifetime of an entry in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retrieve a value from the cache
+
+            :arg:
+                key (hashable): Key the value was stored under
+
+            :return
+                (object): Cached value, or None if the key is missing or
+                has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None):
+        """Store a value in the cache
+
+            :arg:
+                key (hashable): Key to store the value under
+                value (object): Value to be cached
+                expires_at (float): Epoch time after which the entry is
+                    stale. Defaults to now + ttl and is never later than that
+        """
+        default_expiry = time.time() + self.ttl
+        if expires_at is None or expires_at > default_expiry:
+            expires_at = default_expiry
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a single entry from the cache if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, predicate):
+        """Remove every entry whose value matches the predicate
+
+            :arg:
+                predicate (function): Called with each cached value, entries
+                    for which it returns True are removed
+        """
+        with self._lock:
+            stale_keys = [key for key, (value, _) in self._entries.items()
+                          if predicate(value)]
+            for key in stale_keys:
+                del self._entries[key]
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Summarise how the cache has been performing
+
+            :return
+                (dict): hits, misses and current number of entries
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries)
+            }
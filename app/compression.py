@@ -0,0 +1,204 @@
+import zlib
+from flask import current_app
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; clients then get gzip or deflate
+    brotli = None
+
+# content codings in order of preference when the client accepts several
+# equally; brotli compresses JSON best but is only offered when installed
+ENCODINGS = ('br', 'gzip', 'deflate')
+
+# media types worth compressing; images and the like already are
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript',
+                      'application/x-yaml', 'text/')
+
+
+def compress(data, encoding, level):
+    """Compresses a payload with one of the supported content codings
+
+        :arg:
+            data (bytes): Payload
+            encoding (string): `br`, `gzip` or `deflate`
+            level (int): Compression level, 1 (fastest) to 9 (smallest)
+
+        :return
+            (bytes): Compressed payload
+    """
+    if encoding == 'br':
+        # brotli's quality goes up to 11
+        return brotli.compress(data, quality=min(level, 11))
+
+    # gzip and deflate differ only in their wrapper; written without a
+    # timestamp, the same payload always compresses to the same bytes
+    wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+    compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    """Compresses a payload that is sent in chunks. The compressor is flushed
+    after every chunk so that the client can decode each one on arrival
+
+        :arg:
+            chunks (iterable): Pieces of the payload, as bytes
+            encoding (string): `br`, `gzip` or `deflate`
+            level (int): Compression level, 1 (fastest) to 9 (smallest)
+
+        :return
+            (generator): Compressed payload, one piece per chunk
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+
+        def compress_chunk(chunk):
+            return compressor.process(chunk) + compressor.flush()
+        finish = compressor.finish
+    else:
+        wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+        compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, wbits)
+
+        def compress_chunk(chunk):
+            return (compressor.compress(chunk) +
+                    compressor.flush(zlib.Z_SYNC_FLUSH))
+        finish = compressor.flush
+
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield compress_chunk(chunk)
+        yield finish()
+    finally:
+        # release whatever the chunks are read from, e.g. a database cursor,
+        # also when the client goes away before the end
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class Compressor(object):
+    """Compresses responses with the best content coding the client accepts
+    in its `Accept-Encoding` header.
+
+    Only payloads of at least `COMPRESS_MIN_SIZE` bytes are compressed, at
+    `COMPRESS_LEVEL`; streamed payloads, whose size is not known in advance,
+    always are. Payloads that never change, like the API's swagger
+    spec, can be compressed once at the highest level with `precompress`
+    and are then served without running their view.
+    """
+
+    def __init__(self, app=None):
+        self.encodings = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Compresses the application's responses from now on
+
+            :arg:
+                app (object): Flask application
+        """
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        self.encodings = tuple(encoding for encoding in ENCODINGS
+                               if encoding != 'br' or brotli is not None)
+        app.extensions['precompressed'] = {}
+
+        app.before_request(self._serve_static)
+        app.after_request(self._compress_response)
+
+    def negotiate(self):
+        """Picks the content coding of the current request's response
+
+            :return
+                (string): Content coding, or None to send the payload as is
+        """
+        accepted = request.accept_encodings
+        best = max(self.encodings, key=lambda encoding: accepted[encoding])
+        return best if accepted[best] else None
+
+    def precompress(self, app, path):
+        """Renders a GET route that always returns the same payload and
+        keeps it compressed with every content coding, to be served in
+        place of the route from then on
+
+            :arg:
+                app (object): Flask application
+                path (string): Path of the route
+        """
+        response = app.test_client().get(path)
+        data = response.get_data()
+        variants = {None: data}
+        for encoding in self.encodings:
+            variants[encoding] = compress(data, encoding, 11)
+        app.extensions['precompressed'][path] = (response.mimetype, variants)
+
+    def _serve_static(self):
+        precompressed = current_app.extensions['precompressed']
+        if request.method != 'GET' or request.path not in precompressed:
+            return None
+
+        mimetype, variants = precompressed[request.path]
+        encoding = self.negotiate()
+        response = current_app.response_class(variants[encoding],
+                                              mimetype=mimetype)
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _revalidated(self, response):
+        # a 304 stands in for the response the client holds and carries its
+        # ETag and Vary header. It was compressed if the client holds the
+        # ETag with the negotiated coding appended
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        encoding = self.negotiate()
+        if etag and encoding:
+            tag = '{}-{}'.format(etag, encoding)
+            if request.if_none_match.contains_weak(tag):
+                response.set_etag(tag, weak)
+        return response
+
+    def _compress_response(self, response):
+        if response.status_code == 304:
+            return self._revalidated(response)
+        if (response.direct_passthrough or
+                not 200 <= response.status_code < 300 or
+                response.status_code == 204 or
+                'Content-Encoding' in response.headers or
+                not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+            return response
+
+        level = current_app.config['COMPRESS_LEVEL']
+        if response.is_streamed:
+            data = None
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+                return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if not encoding:
+            return response
+
+        if data is None:
+            # compress the stream as it is sent; its length is unknown
+            response.response = compress_stream(response.response, encoding,
+                                                level)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+
+        # each coding is a different representation, with its own ETag
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag('{}-{}'.format(etag, encoding), weak)
+        return response
+
+
+compressor = Compressor()
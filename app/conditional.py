@@ -0,0 +1,121 @@
+import hashlib
+from flask import current_app
+from flask import request
+from werkzeug.http import http_date
+from werkzeug.http import quote_etag
+from app.compression import ENCODINGS
+from app.replicas import SAFE_METHODS
+
+
+def list_etag(list_id, version):
+    """Creates the entity tag of a resource that changes with a shoppinglist:
+    the list itself, its items and each of its items. The list's version is
+    increased whenever the list or one of its items changes
+
+        :arg:
+            list_id (int): ID of the shoppinglist
+            version (int): Version of the shoppinglist
+
+        :return
+            (string): Quoted, strong entity tag
+    """
+    return quote_etag('{}-{}'.format(list_id, version))
+
+
+def page_etag(versions, next_cursor=None):
+    """Creates the entity tag of a page of shoppinglists. The cursor of the
+    next page is part of it: a list created after the last one changes the
+    page's links even though the page itself does not change
+
+        :arg:
+            versions (list): ID and version of every shoppinglist on the page
+            next_cursor (string): Cursor of the next page, or None
+
+        :return
+            (string): Quoted, strong entity tag
+    """
+    digest = hashlib.sha1(','.join(
+        '{}-{}'.format(list_id, version)
+        for list_id, version in versions).encode('utf-8'))
+    if next_cursor:
+        digest.update(';{}'.format(next_cursor).encode('utf-8'))
+    return quote_etag(digest.hexdigest())
+
+
+def _variants(etag):
+    # compressed responses carry the ETag with their content coding appended
+    tag = etag.strip('"')
+    return [tag] + ['{}-{}'.format(tag, encoding) for encoding in ENCODINGS]
+
+
+def cache_headers(etag, last_modified=None):
+    """Creates the headers that let clients revalidate a response
+
+        :arg:
+            etag (string): Entity tag of the response
+            last_modified (datetime): When the resource last changed
+
+        :return
+            (dict): `ETag` and, if known, `Last-Modified` headers
+    """
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(etag):
+    """Checks if the client already holds the current representation, as
+    named by the request's `If-None-Match` header
+
+        :arg:
+            etag (string): Current entity tag of the resource
+
+        :return
+            (boolean): True if a 304 response should be sent
+    """
+    return (request.method in SAFE_METHODS and
+            any(request.if_none_match.contains_weak(tag)
+                for tag in _variants(etag)))
+
+
+def precondition_failed(etag):
+    """Checks the request's `If-Match` header, which clients send to only
+    change a resource that nobody changed since they read it
+
+        :arg:
+            etag (string): Current entity tag of the resource
+
+        :return
+            (boolean): True if a 412 response should be sent
+    """
+    return (bool(request.if_match) and
+            not any(request.if_match.contains(tag)
+                    for tag in _variants(etag)))
+
+
+def lock_for_conditional_write(query):
+    """Locks the rows a conditional write loads until it commits, so that the
+    `If-Match` check cannot be overtaken by a concurrent write
+
+        :arg:
+            query (object): Query loading the resource
+
+        :return
+            (object): The query, locking its rows for conditional writes
+    """
+    if request.method not in SAFE_METHODS and request.if_match:
+        return query.with_for_update()
+    return query
+
+
+def not_modified_response(headers):
+    """Creates an empty 304 response
+
+        :arg:
+            headers (dict): Headers the full response would carry
+
+        :return
+            (object): Response
+    """
+    return current_app.response_class(status=304, headers=headers)
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+import flask_sqlalchemy
+from sqlalchemy import event
+from sqlalchemy import exc
+from sqlalchemy import orm
+from sqlalchemy.pool import QueuePool
+from app.replicas import RoutingSession
+
+
+class MonitoredQueuePool(QueuePool):
+    """Connection pool that records how long requests wait to check out a
+    connection and how many connections are in use, for right-sizing the
+    pool"""
+
+    def __init__(self, *args, **kwargs):
+        super(MonitoredQueuePool, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._max_checked_out = 0
+
+    def _do_get(self):
+        # every checkout goes through here, waiting for a connection to be
+        # returned when the pool and its overflow are exhausted
+        start = time.time()
+        try:
+            connection = super(MonitoredQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+
+        wait_time = time.time() - start
+        checked_out = self.checkedout()
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+            self._max_checked_out = max(self._max_checked_out, checked_out)
+        return connection
+
+    def stats(self):
+        """Reports the pool's usage since it was created
+
+            :return
+                (dict): Pool size, connections in use and in overflow,
+                number of checkouts and timeouts, total and longest checkout
+                wait in seconds and the most connections in use at once
+        """
+        with self._stats_lock:
+            return {
+                'pool_size': self.size(),
+                'checked_out': self.checkedout(),
+                'overflow': max(self.overflow(), 0),
+                'max_checked_out': self._max_checked_out,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_time': self._wait_time,
+                'max_wait_time': self._max_wait_time,
+            }
+
+
+def _record_process(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+def _discard_inherited_connection(dbapi_connection, connection_record,
+                                  connection_proxy):
+    # a connection opened before the process forked is shared with the
+    # parent; drop it without closing it so the parent's session survives
+    if connection_record.info.get('pid') != os.getpid():
+        connection_record.connection = connection_proxy.connection = None
+        raise exc.DisconnectionError(
+            'Connection belongs to process {}'.format(
+                connection_record.info.get('pid')))
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys, and so their cascading deletes, unless
+    # every connection asks for them
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def _ping_connection(dbapi_connection, connection_record, connection_proxy):
+    # replace connections the server has closed before they are used
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception:
+        raise exc.DisconnectionError('Connection failed a ping')
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """Flask-SQLAlchemy extension that also applies the pooling and session
+    settings below, besides the `SQLALCHEMY_POOL_*` ones it already reads:
+
+    * ``SQLALCHEMY_POOL_PRE_PING``: test connections with `SELECT 1` when
+      they are checked out and replace the ones that are dead.
+    * ``SQLALCHEMY_STATEMENT_TIMEOUT``: milliseconds after which PostgreSQL
+      cancels a statement.
+
+    Foreign keys are enforced on SQLite too, so that it cascades deletes
+    like the other databases.
+
+    Its sessions send reads to replicas when `REPLICA_BINDS` are configured,
+    see `app.replicas`.
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        super(SQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+        # every database but SQLite without a pool size uses a QueuePool
+        if 'poolclass' not in options:
+            options['poolclass'] = MonitoredQueuePool
+
+        statement_timeout = app.config.get('SQLALCHEMY_STATEMENT_TIMEOUT')
+        if statement_timeout and info.drivername.startswith('postgresql'):
+            connect_args = options.setdefault('connect_args', {})
+            connect_args['options'] = '-c statement_timeout={}'.format(
+                int(statement_timeout))
+
+    def get_engine(self, app=None, bind=None):
+        engine = super(SQLAlchemy, self).get_engine(app, bind)
+
+        # the pool's listeners are kept when the engine is disposed
+        if not event.contains(engine.pool, 'checkout',
+                              _discard_inherited_connection):
+            event.listen(engine.pool, 'connect', _record_process)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine.pool, 'connect', _enforce_foreign_keys)
+            event.listen(engine.pool, 'checkout',
+                         _discard_inherited_connection)
+            if self.get_app(app).config.get('SQLALCHEMY_POOL_PRE_PING'):
+                event.listen(engine.pool, 'checkout', _ping_connection)
+        return engine
@@ -0,0 +1,137 @@
+import hashlib
+import hmac
+import bcrypt
+from flask import current_app
+
+try:
+    from gevent import monkey as gevent_monkey
+except ImportError:  # gevent is only installed for gevent workers
+    gevent_monkey = None
+
+if gevent_monkey and gevent_monkey.is_module_patched('threading'):
+    # patched threads are greenlets; use gevent's pool of real OS threads so
+    # hashing does not block the event loop
+    from gevent.threadpool import ThreadPoolExecutor
+else:
+    from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordHasher(object):
+    """Hashes and verifies passwords with bcrypt on a bounded thread pool.
+
+    bcrypt releases the GIL while it works, so running it on a small pool
+    of threads keeps the CPU cost of logins and registrations bounded
+    instead of letting every concurrent request hash at once. The cost
+    factor is read from the `BCRYPT_LOG_ROUNDS` setting of the application.
+    """
+
+    def __init__(self, app=None):
+        self.max_workers = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Sizes the hashing thread pool using the application's config
+
+            :arg:
+                app (object): Flask application
+        """
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+
+        max_workers = app.config['PASSWORD_HASH_WORKERS']
+        if max_workers != self.max_workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+            self.max_workers = max_workers
+
+    def _run(self, function, *args):
+        return self._executor.submit(function, *args).result()
+
+    def hash_password(self, password):
+        """Calculates a salted bcrypt hash of a password
+
+            :arg:
+                password (str): Password to be hashed
+
+            :return
+                (str): bcrypt hash
+        """
+        rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+        password_hash = self._run(bcrypt.hashpw, str.encode(password),
+                                  bcrypt.gensalt(rounds))
+        return password_hash.decode('ascii')
+
+    def check_password(self, password, password_hash):
+        """Checks a password against a bcrypt or legacy SHA1 hash
+
+            :arg:
+                password (str): Password provided by the user
+                password_hash (str): Hash stored for the user
+
+            :return
+                (boolean): True if the password matches the hash
+        """
+        if is_legacy_hash(password_hash):
+            return hmac.compare_digest(sha1_hash(password), password_hash)
+
+        return self._run(bcrypt.checkpw, str.encode(password),
+                         str.encode(password_hash))
+
+    @staticmethod
+    def needs_rehash(password_hash):
+        """Checks whether a hash was created with a legacy scheme or a lower
+        cost than currently configured
+
+            :arg:
+                password_hash (str): Hash stored for the user
+
+            :return
+                (boolean): True if the hash should be upgraded
+        """
+        if is_legacy_hash(password_hash):
+            return True
+
+        rounds = int(password_hash.split('$')[2])
+        return rounds < current_app.config['BCRYPT_LOG_ROUNDS']
+
+
+def is_legacy_hash(password_hash):
+    """Checks if a hash was created by `sha1_hash`
+
+        :arg:
+            password_hash (str): Hash stored for the user
+
+        :return
+            (boolean): True if the hash is a legacy SHA1 hash
+    """
+    return not password_hash.startswith('$2')
+
+
+def sha1_hash(value):
+    """Calculates the SHA1 has of a string. Only used to verify passwords
+    stored before bcrypt was introduced
+
+            :arg:
+                value (str): String to be hashed
+
+            :return
+                (str): SHA1 hash
+        """
+
+    # add salt to the value
+    salt = "!@3`tHy:'hj6^&7m4qG9[6"
+    salted_value = value + salt
+
+    # convert string to bytes
+    value = str.encode(salted_value)
+
+    # calculate a SHA1 hash
+    hash_object = hashlib.sha1(value)
+    hashed_value = hash_object.hexdigest()
+    return hashed_value
+
+
+password_hasher = PasswordHasher()
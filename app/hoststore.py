@@ -0,0 +1,40 @@
+import sqlite3
+from contextlib import closing
+
+
+class HostStore(object):
+    """Base of the stores that the worker processes of one host share
+    through a SQLite file, such as the token revocations and the replica
+    pins. The file is only shared by the workers of one host; each host of
+    a multi-host deployment has its own.
+
+    Subclasses name the setting holding the file's path in `path_setting`
+    and the statement creating their table in `schema`.
+    """
+
+    path_setting = None
+    schema = None
+
+    def __init__(self, app=None):
+        self.path = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Creates the store's table in the shared file if it does not exist
+
+            :arg:
+                app (object): Flask application
+        """
+        self.path = app.config[self.path_setting]
+
+        # WAL lets the workers read while one of them writes
+        self._execute(('PRAGMA journal_mode=WAL',))
+        self._execute((self.schema,))
+
+    def _execute(self, *statements):
+        with closing(sqlite3.connect(self.path, timeout=5)) as connection:
+            with connection:
+                results = [connection.execute(*statement).fetchall()
+                           for statement in statements]
+        return results[-1]
@@ -0,0 +1,208 @@
+import os
+import random
+import threading
+import time
+
+# IDs are built from the milliseconds since EPOCH, the ID of the worker
+# process and a per-millisecond counter. 41 + 6 + 6 bits keeps them within
+# the 53 bits a JavaScript client can represent exactly. When several hosts
+# run the app, the worker ID is the host's NODE_ID followed by the worker's
+# slot on that host, 3 bits each
+EPOCH = 1483228800000  # 2017-01-01 00:00:00 UTC, in milliseconds
+TIMESTAMP_BITS = 41
+WORKER_BITS = 6
+SEQUENCE_BITS = 6
+NODE_BITS = 3
+SLOT_BITS = WORKER_BITS - NODE_BITS
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+MAX_NODE_SLOT = (1 << SLOT_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# IDs are stored as signed 64-bit integers, and so are compared with them
+MAX_ID = (1 << 63) - 1
+
+
+def generate_random_id():
+    """generates a random integer value between 1 and 100000000
+        :return
+            (int): randomly generated integer
+    """
+    random_id = random.randrange(1, 100000000)
+    return random_id
+
+
+def is_valid_id(value):
+    """Checks if a value provided by a client can be compared with IDs
+
+        :arg:
+            value (object): Decoded from the request
+
+        :return
+            (boolean): True for an integer, not a boolean, that fits an ID
+            column
+    """
+    return type(value) is int and 0 <= value <= MAX_ID
+
+
+class IdGenerator(object):
+    """Generates primary keys for new rows.
+
+    The strategy is picked with the `ID_GENERATOR` setting:
+
+    * ``time_ordered`` (default): unique, roughly time-ordered integers
+      computed in process, so new rows are appended to the end of the
+      primary key index and no uniqueness check is needed. Each concurrently
+      running worker process needs its own worker ID: a configured
+      `WORKER_ID` (0-63), or else the slot gunicorn.conf.py gives the
+      worker on its host, combined with the host's `NODE_ID` (0-7) when
+      several hosts run the app. A process with neither leaves its IDs to
+      the database's sequence rather than risk a collision.
+    * ``sequence``: leaves the ID empty for the database's sequence to fill.
+    * ``random``: the legacy random integer between 1 and 100000000.
+    """
+
+    def __init__(self, app=None):
+        self.strategy = 'time_ordered'
+        self.worker_id = None
+        self.configured_worker_id = None
+        self.node_id = None
+        self._slot = None
+        self._slot_pid = None
+        self._pid = None
+        self._last_timestamp = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Picks the ID strategy, worker ID and node ID from the application's
+        config
+
+            :arg:
+                app (object): Flask application
+        """
+        strategy = app.config.get('ID_GENERATOR', 'time_ordered')
+        worker_id = app.config.get('WORKER_ID')
+        node_id = app.config.get('NODE_ID')
+        worker_id = None if worker_id is None else int(worker_id)
+        node_id = None if node_id is None else int(node_id)
+
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError('WORKER_ID must be between 0 and {}'.format(
+                MAX_WORKER_ID))
+        if node_id is not None and not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError('NODE_ID must be between 0 and {}'.format(
+                MAX_NODE_ID))
+        if (strategy == 'time_ordered' and app.config.get('MULTI_HOST') and
+                worker_id is None and node_id is None):
+            # slots are only unique on one host: workers on different hosts
+            # would generate the same IDs
+            raise ValueError('time_ordered IDs need a NODE_ID on each host '
+                             'when several hosts run the app; set one or '
+                             'use ID_GENERATOR=sequence')
+
+        with self._lock:
+            self.strategy = strategy
+            self.configured_worker_id = worker_id
+            self.node_id = node_id
+            self._pid = None  # work the worker ID out again on next use
+
+    def set_worker_id(self, worker_id):
+        """Sets the ID of the current worker process
+
+            :arg:
+                worker_id (int): Value between 0 and 63 that no other
+                    running worker uses
+        """
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError('worker ID must be between 0 and {}'.format(
+                MAX_WORKER_ID))
+        with self._lock:
+            self.worker_id = worker_id
+            self._pid = os.getpid()
+
+    def set_slot(self, slot):
+        """Sets the slot of the current worker process among the workers of
+        its host, which the worker ID is made from unless `WORKER_ID` is
+        configured
+
+            :arg:
+                slot (int): Value between 0 and 63 that no other running
+                    worker on the host uses, at most 7 with a `NODE_ID`
+        """
+        if not 0 <= slot <= MAX_WORKER_ID:
+            raise ValueError('slot must be between 0 and {}'.format(
+                MAX_WORKER_ID))
+        with self._lock:
+            self._slot = slot
+            self._slot_pid = os.getpid()
+            self._pid = None
+
+    def next_id(self):
+        """Generates the ID of a new row
+
+            :return
+                (int): New ID, or None if the database assigns it
+        """
+        if self.strategy == 'sequence':
+            return None
+        if self.strategy == 'random':
+            return generate_random_id()
+        return self._next_time_ordered_id()
+
+    def _own_worker_id(self):
+        if self.configured_worker_id is not None:
+            return self.configured_worker_id
+        if self._slot_pid != os.getpid():
+            # not a gunicorn worker, or a child forked from one
+            return None
+        if self.node_id is None:
+            return self._slot
+        if self._slot > MAX_NODE_SLOT:
+            raise ValueError('at most {} workers per host can generate '
+                             'time_ordered IDs with a NODE_ID'.format(
+                                 MAX_NODE_SLOT + 1))
+        return (self.node_id << SLOT_BITS) | self._slot
+
+    def _next_time_ordered_id(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # first use in this process, or since the config changed
+                self.worker_id = self._own_worker_id()
+                self._pid = os.getpid()
+                self._last_timestamp = -1
+            if self.worker_id is None:
+                return None
+
+            timestamp = self._current_timestamp()
+            if timestamp < self._last_timestamp:
+                # the clock moved backwards, wait until it catches up
+                timestamp = self._wait_for(self._last_timestamp)
+
+            if timestamp == self._last_timestamp:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # counter exhausted for this millisecond
+                    timestamp = self._wait_for(self._last_timestamp + 1)
+            else:
+                self._sequence = 0
+
+            self._last_timestamp = timestamp
+            return ((timestamp << (WORKER_BITS + SEQUENCE_BITS)) |
+                    (self.worker_id << SEQUENCE_BITS) | self._sequence)
+
+    @staticmethod
+    def _current_timestamp():
+        return int(time.time() * 1000) - EPOCH
+
+    def _wait_for(self, timestamp):
+        current = self._current_timestamp()
+        while current < timestamp:
+            time.sleep(0.0001)
+            current = self._current_timestamp()
+        return current
+
+
+id_generator = IdGenerator()
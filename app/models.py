@@ -1,27 +1,23 @@
 import os
-import random
-import datetime
-import time
-from flask_sqlalchemy import SQLAlchemy
+from app.database import SQLAlchemy
+from app.ids import generate_random_id  # legacy strategy, kept importable
+from app.ids import id_generator
+from app.timestamps import UTCDateTime
+from app.timestamps import utcnow
 
 
 db = SQLAlchemy()  # initialize sql-alchemy
 secret_key = os.urandom(24)  # create a random secret key
 
-
-def generate_random_id():
-    """generates a random integer value between 1 and 100000000
-        :return
-            (int): randomly generated integer
-    """
-    random_id = random.randrange(1, 100000000)
-    return random_id
+# IDs are 64-bit integers; SQLite's INTEGER already is, and must stay the
+# rowid alias for the search index
+ID_TYPE = db.BigInteger().with_variant(db.Integer(), 'sqlite')
 
 
 class User(db.Model):
     """This class defines the users table """
     __tablename__ = 'users'
-    id = db.Column('id', db.Integer, primary_key=True)
+    id = db.Column('id', ID_TYPE, primary_key=True)
     username = db.Column('username', db.String(50), unique=True)
     firstname = db.Column('firstname', db.String(10), nullable=False)
     lastname = db.Column('lastname', db.String(10), nullable=False)
@@ -30,14 +26,16 @@ class User(db.Model):
     answer = db.Column('answer', db.String(100))
 
     # create virtual column (back-reference)
-    # for maintaining table relationship and data integrity
+    # for maintaining table relationship and data integrity. The database
+    # deletes a user's lists, see ShoppingListItems.shoppinglist_id
     users = db.relationship(
-        "Shoppinglists", backref="users", lazy="dynamic")
+        "Shoppinglists", backref="users", lazy="dynamic",
+        cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, username, password_hash, answer, security_question,
                  firstname='', lastname=''):
         """Initialize the user """
-        self.id = generate_random_id()
+        self.id = id_generator.next_id()
         self.username = username
         self.firstname = firstname
         self.lastname = lastname
@@ -53,12 +51,38 @@ class User(db.Model):
 class Shoppinglists(db.Model):
     """This class defines the shoppinglists table """
     __tablename__ = 'shoppinglists'
-    id = db.Column('id', db.Integer, primary_key=True)
+    __table_args__ = (
+        # every list query filters by owner; a user's titles are unique
+        db.Index('ix_shoppinglists_user_id_title', 'user_id', 'title',
+                 unique=True),
+        # serves keyset pagination of a user's lists in id order
+        db.Index('ix_shoppinglists_user_id_id', 'user_id', 'id'),
+        # serve the `modified_since` and `created_before` filters
+        db.Index('ix_shoppinglists_user_id_modified_on', 'user_id',
+                 'modified_on'),
+        db.Index('ix_shoppinglists_user_id_created_on', 'user_id',
+                 'created_on'),
+    )
+    id = db.Column('id', ID_TYPE, primary_key=True)
     title = db.Column('title', db.String(100), nullable=False)
-    created_on = db.Column('created_on', db.String(20), nullable=False)
-    modified_on = db.Column('modified_on', db.String(20), nullable=False)
+    created_on = db.Column('created_on', UTCDateTime, nullable=False)
+    modified_on = db.Column('modified_on', UTCDateTime, nullable=False)
+
+    # kept up to date in the same transaction as every change to the list's
+    # items, so that list views need not aggregate the items
+    item_count = db.Column('item_count', db.Integer, nullable=False,
+                           default=0, server_default='0')
+    total_cost = db.Column('total_cost', db.Float, nullable=False,
+                           default=0, server_default='0')
+    last_item_change = db.Column('last_item_change', UTCDateTime)
+
+    # increased whenever the list or one of its items changes; identifies
+    # the versions of the list's resources in ETags
+    version = db.Column('version', db.Integer, nullable=False, default=1,
+                        server_default='1')
+
     user_id = db.Column(
-        'user_id', db.Integer,
+        'user_id', ID_TYPE,
         db.ForeignKey(
             'users.id',
             onupdate="CASCADE",
@@ -67,23 +91,22 @@ class Shoppinglists(db.Model):
         nullable=False)
 
     # create virtual column (back-reference)
-    # for maintaining table relationship and data integrity
+    # for maintaining table relationship and data integrity. The database
+    # deletes a list's items, see ShoppingListItems.shoppinglist_id
     shoppinglists_items = db.relationship(
-        "ShoppingListItems", backref="shoppinglists", lazy="dynamic")
+        "ShoppingListItems", backref="shoppinglists", lazy="dynamic",
+        cascade="all, delete-orphan", passive_deletes=True)
 
     def __init__(self, title, user_id):
         """Initialize with a title"""
         self.title = title
-        self.id = generate_random_id()
+        self.id = id_generator.next_id()
         self.user_id = user_id
 
-        # get current timestamp
-        epoch_time = time.time()
-        timestamp = datetime.datetime.fromtimestamp(epoch_time).strftime(
-            '%Y-%m-%d %H:%M:%S')
-
-        self.created_on = timestamp
-        self.modified_on = "--"
+        # a new list counts as modified when it is created so that clients
+        # polling with `modified_since` pick it up
+        self.created_on = utcnow()
+        self.modified_on = self.created_on
 
     def save(self):
         db.session.add(self)
@@ -97,12 +120,22 @@ class Shoppinglists(db.Model):
 class ShoppingListItems(db.Model):
     """This class defines the shopping-lists items table """
     __tablename__ = 'shoppinglist_items'
-    id = db.Column('id', db.Integer, primary_key=True)
+    __table_args__ = (
+        # every item query filters by list; no two items of a list are
+        # identical
+        db.Index('ix_shoppinglist_items_list_id_name', 'shoppinglist_id',
+                 'name', 'price', 'quantity', unique=True),
+        # serves keyset pagination of a list's items in id order
+        db.Index('ix_shoppinglist_items_list_id_id', 'shoppinglist_id', 'id'),
+    )
+    id = db.Column('id', ID_TYPE, primary_key=True)
     name = db.Column('name', db.String(100), nullable=False)
     price = db.Column('price', db.Float, nullable=False)
     quantity = db.Column('quantity', db.Float, nullable=False)
+    # deleting a list deletes its items in the same statement, without
+    # loading them
     shoppinglist_id = db.Column(
-        db.Integer, db.ForeignKey(
+        ID_TYPE, db.ForeignKey(
             'shoppinglists.id',
             onupdate="CASCADE",
             ondelete="CASCADE"
@@ -113,7 +146,7 @@ class ShoppingListItems(db.Model):
     def __init__(self, name, shoppinglist_id, price, quantity=1):
         """Initialize with a title"""
         self.name = name
-        self.id = generate_random_id()
+        self.id = id_generator.next_id()
         self.shoppinglist_id = shoppinglist_id
         self.price = price
         self.quantity = quantity
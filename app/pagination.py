@@ -0,0 +1,133 @@
+import base64
+import json
+from itertools import islice
+from flask import request
+from flask import url_for
+from app.ids import is_valid_id
+
+
+def encode_cursor(last_id):
+    """Creates an opaque cursor pointing just after a row
+
+        :arg:
+            last_id (int): ID of the last row of the current page
+
+        :return
+            (string): URL safe cursor
+    """
+    payload = json.dumps({'after': last_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Reads the row ID a cursor points after
+
+        :arg:
+            cursor (string): Cursor provided by the client
+
+        :return
+            (int): ID of the last row of the previous page, or None if the
+            cursor is not valid
+    """
+    try:
+        padded_cursor = cursor + '=' * (-len(cursor) % 4)
+        payload = base64.urlsafe_b64decode(padded_cursor.encode('ascii'))
+        after_id = json.loads(payload.decode('utf-8'))['after']
+    except (ValueError, TypeError, KeyError):
+        return None
+
+    # cursors are only ever made from IDs; anything else, including floats
+    # and integers too large for the ID column, is not a cursor of ours
+    if not is_valid_id(after_id):
+        return None
+    return after_id
+
+
+def page_query(query, key, limit=None, after_id=None):
+    """Builds the query for one page of a query ordered by an indexed key.
+    Rows are located by seeking past the previous page's last key rather than
+    with OFFSET, so every page costs the same however deep it is. One row more
+    than the limit is fetched, to find out if there is another page
+
+        :arg:
+            query (object): Query to be paged through
+            key (object): Unique, indexed model attribute to order by
+            limit (int): Maximum number of rows on the page, None for all
+            after_id (int): Key of the last row of the previous page
+
+        :return
+            (object): Query of the page's rows
+    """
+    if after_id is not None:
+        query = query.filter(key > after_id)
+    query = query.order_by(key)
+
+    if limit:
+        query = query.limit(limit + 1)
+    return query
+
+
+def paginate(query, key, limit=None, after_id=None):
+    """Fetches one page of a query ordered by an indexed key, see page_query
+
+        :arg:
+            query (object): Query to be paged through
+            key (object): Unique, indexed model attribute to order by
+            limit (int): Maximum number of rows on the page, None for all
+            after_id (int): Key of the last row of the previous page
+
+        :return
+            (tuple): Rows on the page and the cursor of the next page, or
+            None if this is the last page
+    """
+    rows = page_query(query, key, limit, after_id).all()
+    if not limit:
+        return rows, None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(getattr(rows[-1], key.key))
+    return rows, None
+
+
+def iter_chunks(query, key, size):
+    """Reads every row of a query ordered by an indexed key, a chunk at a
+    time. Rows are fetched through a server-side cursor where the database
+    supports one, so only about a chunk of them is held in memory at once
+
+        :arg:
+            query (object): Query to be read
+            key (object): Unique, indexed model attribute to order by
+            size (int): Number of rows in each chunk
+
+        :return
+            (generator): Lists of at most `size` rows
+    """
+    rows = iter(query.order_by(key).yield_per(size))
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pagination_headers(next_cursor):
+    """Creates the headers that point the client to the next page
+
+        :arg:
+            next_cursor (string): Cursor of the next page, or None
+
+        :return
+            (dict): `Link` and `X-Next-Cursor` headers, empty on the last page
+    """
+    if not next_cursor:
+        return {}
+
+    args = request.args.to_dict()
+    args.update(request.view_args)
+    args['cursor'] = next_cursor
+    next_url = url_for(request.endpoint, _external=True, **args)
+    return {
+        'Link': '<{}>; rel="next"'.format(next_url),
+        'X-Next-Cursor': next_cursor
+    }
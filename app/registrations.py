@@ -0,0 +1,50 @@
+import time
+from app.hoststore import HostStore
+
+
+class RegistrationLog(HostStore):
+    """Remembers the usernames registered recently, across worker processes.
+
+    Login caches usernames found not to exist in each worker process. A user
+    registered through another worker would be turned away until that entry
+    expires, so registrations are written to a SQLite file that every worker
+    on the host shares (`REGISTRATION_LOG_DB`), and a worker checks it before
+    trusting a cached unknown username. With several hosts, that cache is
+    not used at all, see `caches_unknown_usernames`.
+    """
+
+    path_setting = 'REGISTRATION_LOG_DB'
+    schema = ('CREATE TABLE IF NOT EXISTS recent_registrations '
+              '(username TEXT PRIMARY KEY, expires_at REAL)')
+
+    def record(self, username, keep_for):
+        """Records that a username has just been registered
+
+            :arg:
+                username (string): Normalised username
+                keep_for (float): Seconds to remember the registration, at
+                    least as long as unknown usernames are cached
+        """
+        now = time.time()
+        self._execute(
+            ('INSERT OR REPLACE INTO recent_registrations '
+             '(username, expires_at) VALUES (?, ?)',
+             (username, now + keep_for)),
+            ('DELETE FROM recent_registrations WHERE expires_at < ?', (now,)))
+
+    def is_registered(self, username):
+        """Checks if a username was registered recently
+
+            :arg:
+                username (string): Normalised username
+
+            :return
+                (boolean): True if it was registered within the time it is
+                remembered for
+        """
+        return bool(self._execute(
+            ('SELECT 1 FROM recent_registrations WHERE username = ? '
+             'AND expires_at >= ?', (username, time.time()))))
+
+
+registration_log = RegistrationLog()
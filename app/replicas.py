@@ -0,0 +1,117 @@
+import random
+import time
+from flask import current_app
+from flask import g
+from flask import has_request_context
+from flask import request
+from flask_sqlalchemy import SignallingSession
+from app.hoststore import HostStore
+
+# requests that only read, and can be served from a replica
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter(HostStore):
+    """Sends the reads of safe, authenticated requests to read replicas.
+
+    Replicas are the `SQLALCHEMY_BINDS` listed in `REPLICA_BINDS`. Requests
+    that write, and everything done before the user is authenticated, use
+    the primary. Once a user has written, their reads stay on the primary
+    for `REPLICA_PIN_SECONDS` so that they see their own changes despite
+    replication lag. The pins are kept in a SQLite file (`REPLICA_PIN_DB`)
+    that every worker on the host shares.
+    """
+
+    path_setting = 'REPLICA_PIN_DB'
+    schema = ('CREATE TABLE IF NOT EXISTS primary_pins '
+              '(user_id INTEGER PRIMARY KEY, expires_at REAL)')
+
+    def init_app(self, app):
+        """Creates the shared pin table if it does not exist and pins users
+        to the primary after requests that write
+
+            :arg:
+                app (object): Flask application
+        """
+        super(ReplicaRouter, self).init_app(app)
+        app.after_request(self._pin_writer)
+
+    @staticmethod
+    def replicas():
+        """Bind keys of the current application's replicas"""
+        return current_app.config.get('REPLICA_BINDS') or []
+
+    def _pin_writer(self, response):
+        user = g.get('user')
+        if (self.replicas() and user is not None and
+                request.method not in SAFE_METHODS and
+                response.status_code < 400):
+            self.pin(user.id)
+        return response
+
+    def pin(self, user_id):
+        """Sends a user's reads to the primary for the next
+        `REPLICA_PIN_SECONDS`
+
+            :arg:
+                user_id (int): ID of the user who wrote
+        """
+        now = time.time()
+        self._execute(
+            ('INSERT OR REPLACE INTO primary_pins (user_id, expires_at) '
+             'VALUES (?, ?)',
+             (user_id, now + current_app.config['REPLICA_PIN_SECONDS'])),
+            ('DELETE FROM primary_pins WHERE expires_at < ?', (now,)))
+
+    def is_pinned(self, user_id):
+        """Checks if a user's reads must go to the primary
+
+            :arg:
+                user_id (int): ID of the user
+
+            :return
+                (boolean): True if the user wrote within the pin window
+        """
+        return bool(self._execute(
+            ('SELECT 1 FROM primary_pins WHERE user_id = ? '
+             'AND expires_at >= ?', (user_id, time.time()))))
+
+    def replica_for_request(self):
+        """Picks the replica that serves the current request's reads
+
+            :return
+                (string): Bind key of the replica, or None if the request
+                must use the primary
+        """
+        if not (has_request_context() and request.method in SAFE_METHODS and
+                self.replicas()):
+            return None
+
+        user = g.get('user')
+        if user is None:
+            return None
+
+        # decided once per request, so that all its reads are consistent
+        if '_replica' not in g:
+            g._replica = (None if self.is_pinned(user.id)
+                          else random.choice(self.replicas()))
+        return g._replica
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(SignallingSession):
+    """Session that reads from the replica picked by `replica_router` and
+    writes to the primary"""
+
+    def __init__(self, db, **options):
+        self.db = db
+        super(RoutingSession, self).__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing:
+            replica = replica_router.replica_for_request()
+            if replica is not None:
+                return self.db.get_engine(self.app, bind=replica)
+        return super(RoutingSession, self).get_bind(mapper, clause)
@@ -0,0 +1,93 @@
+import threading
+import time
+from app.hoststore import HostStore
+
+
+class RevocationStore(HostStore):
+    """Keeps track of revoked authentication tokens across worker processes.
+
+    Revoked token IDs (`jti` claims) are written to a SQLite file that every
+    worker on the host shares. Each worker keeps an in-memory copy of the
+    IDs that have not yet expired and pulls new rows from the file at most
+    once every `TOKEN_REVOCATION_REFRESH` seconds, so checking a token is a
+    set lookup. A token revoked in one worker is rejected by the others
+    within that refresh interval.
+    """
+
+    path_setting = 'TOKEN_REVOCATION_DB'
+    # AUTOINCREMENT keeps row IDs increasing even after old rows are purged,
+    # which the incremental refresh relies on
+    schema = ('CREATE TABLE IF NOT EXISTS revoked_tokens '
+              '(id INTEGER PRIMARY KEY AUTOINCREMENT, '
+              'jti TEXT UNIQUE, expires_at REAL)')
+
+    def __init__(self, app=None):
+        self.refresh_interval = None
+        self._revoked = {}
+        self._last_id = 0
+        self._last_refresh = 0
+        self._lock = threading.Lock()
+        super(RevocationStore, self).__init__(app)
+
+    def init_app(self, app):
+        """Creates the shared revocation table if it does not exist
+
+            :arg:
+                app (object): Flask application
+        """
+        self.refresh_interval = app.config['TOKEN_REVOCATION_REFRESH']
+        self._revoked = {}
+        self._last_id = 0
+        self._last_refresh = 0
+        super(RevocationStore, self).init_app(app)
+
+    def revoke(self, jti, expires_at):
+        """Revokes a token until the time it would have expired anyway
+
+            :arg:
+                jti (string): ID of the token to revoke
+                expires_at (float): Epoch time at which the token expires
+        """
+        self._execute(
+            ('INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) '
+             'VALUES (?, ?)', (jti, expires_at)),
+            # expired tokens are rejected anyway, no need to remember them
+            ('DELETE FROM revoked_tokens WHERE expires_at < ?',
+             (time.time(),)))
+
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        """Checks if a token has been revoked
+
+            :arg:
+                jti (string): ID of the token to check
+
+            :return
+                (boolean): True if the token has been revoked
+        """
+        if time.time() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+        return jti in self._revoked
+
+    def refresh(self):
+        """Loads tokens revoked by other workers since the last refresh and
+        forgets the ones that have expired"""
+        now = time.time()
+        rows = self._execute(
+            ('SELECT id, jti, expires_at FROM revoked_tokens '
+             'WHERE id > ? AND expires_at >= ?', (self._last_id, now)))
+
+        with self._lock:
+            revoked = {jti: expires_at
+                       for jti, expires_at in self._revoked.items()
+                       if expires_at >= now}
+            for row_id, jti, expires_at in rows:
+                revoked[jti] = expires_at
+                self._last_id = max(self._last_id, row_id)
+            self._revoked = revoked
+            self._last_refresh = now
+
+
+revocation_store = RevocationStore()
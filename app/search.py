@@ -0,0 +1,187 @@
+import sqlite3
+from sqlalchemy import Column
+from sqlalchemy import DDL
+from sqlalchemy import Float
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+from sqlalchemy import Text
+from sqlalchemy import event
+from sqlalchemy import func
+from app.models import db
+from app.models import Shoppinglists
+from app.models import ShoppingListItems
+
+# the FTS5 trigram tokenizer, which matches arbitrary substrings, was added
+# in SQLite 3.34
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+# keywords shorter than a trigram cannot be looked up in the index
+MIN_INDEXED_KEYWORD_LENGTH = 3
+
+# columns searched with `?q=`, keyed by table
+SEARCHABLE_COLUMNS = {
+    Shoppinglists.__table__: 'title',
+    ShoppingListItems.__table__: 'name',
+}
+
+# describes the SQLite FTS5 shadow tables so they can be used in queries;
+# they are created by the DDL below rather than by `db.create_all()`
+fts_metadata = MetaData()
+
+
+def fts_table(table):
+    """Returns the FTS5 shadow table that indexes a table's search column
+
+        :arg:
+            table (object): Table whose search column is indexed
+
+        :return
+            (object): Shadow table
+    """
+    name = '{}_fts'.format(table.name)
+    if name not in fts_metadata.tables:
+        Table(name, fts_metadata,
+              Column('rowid', Integer),
+              Column(SEARCHABLE_COLUMNS[table], Text),
+              Column('rank', Float))
+    return fts_metadata.tables[name]
+
+
+def postgresql_ddl(table):
+    """Statements that create the trigram index used to search a table on
+    PostgreSQL"""
+    column = SEARCHABLE_COLUMNS[table]
+    return [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE INDEX IF NOT EXISTS ix_{0}_{1}_trgm ON {0} '
+        'USING gin ({1} gin_trgm_ops)'.format(table.name, column),
+    ]
+
+
+def sqlite_ddl(table):
+    """Statements that create the FTS5 shadow table used to search a table on
+    SQLite and the triggers that keep it in sync with the table"""
+    column = SEARCHABLE_COLUMNS[table]
+    values = {'table': table.name, 'column': column,
+              'fts': fts_table(table).name}
+    return [statement.format(**values) for statement in (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        "{column}, content='{table}', content_rowid='id', "
+        "tokenize='trigram')",
+
+        "CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+        "BEGIN INSERT INTO {fts} (rowid, {column}) "
+        "VALUES (new.id, new.{column}); END",
+
+        "CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+        "BEGIN INSERT INTO {fts} ({fts}, rowid, {column}) "
+        "VALUES ('delete', old.id, old.{column}); END",
+
+        "CREATE TRIGGER IF NOT EXISTS {fts}_update "
+        "AFTER UPDATE OF {column} ON {table} "
+        "BEGIN INSERT INTO {fts} ({fts}, rowid, {column}) "
+        "VALUES ('delete', old.id, old.{column}); "
+        "INSERT INTO {fts} (rowid, {column}) "
+        "VALUES (new.id, new.{column}); END",
+    )]
+
+
+def _is_sqlite_with_trigram(ddl, target, bind, **kw):
+    return bind.dialect.name == 'sqlite' and SQLITE_TRIGRAM
+
+
+def _is_postgresql_with_trigram(ddl, target, bind, **kw):
+    # pg_trgm ships with the contrib package, which may not be installed
+    return bind.dialect.name == 'postgresql' and bool(bind.execute(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    ).scalar())
+
+
+# whether pg_trgm is installed, by database URL
+_trigram_installed = {}
+
+
+def has_trigram_index(bind):
+    """Checks if the trigram search index can be used on a PostgreSQL
+    database
+
+        :arg:
+            bind (object): Engine of the database
+
+        :return
+            (boolean): True if the pg_trgm extension is installed
+    """
+    url = str(bind.url)
+    if url not in _trigram_installed:
+        _trigram_installed[url] = bool(bind.execute(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").scalar())
+    return _trigram_installed[url]
+
+
+for searchable_table in SEARCHABLE_COLUMNS:
+    for statement in postgresql_ddl(searchable_table):
+        event.listen(searchable_table, 'after_create',
+                     DDL(statement).execute_if(
+                         callable_=_is_postgresql_with_trigram))
+
+    for statement in sqlite_ddl(searchable_table):
+        event.listen(searchable_table, 'after_create',
+                     DDL(statement).execute_if(
+                         callable_=_is_sqlite_with_trigram))
+
+    # the shadow table is not part of the models' metadata
+    event.listen(searchable_table, 'before_drop',
+                 DDL('DROP TABLE IF EXISTS {}'.format(
+                     fts_table(searchable_table).name)).execute_if(
+                     callable_=_is_sqlite_with_trigram))
+
+
+def escape_like(keyword):
+    """Escapes the LIKE wildcards in a keyword so that they match literally
+
+        :arg:
+            keyword (string): Keyword provided by the user
+
+        :return
+            (string): Keyword safe to embed in a LIKE pattern
+    """
+    return keyword.replace('\\', '\\\\').replace(
+        '%', '\\%').replace('_', '\\_')
+
+
+def search(query, column, keyword):
+    """Narrows a query to rows whose column contains a keyword, ordered by
+    relevance
+
+        :arg:
+            query (object): Query on the model that owns the column
+            column (object): Model attribute to search, e.g.
+                `Shoppinglists.title`
+            keyword (string): Text to look for
+
+        :return
+            (object): Query with the search applied
+    """
+    table = column.expression.table
+    bind = db.session.get_bind()
+    dialect = bind.dialect.name
+    pattern = '%{}%'.format(escape_like(keyword))
+
+    if dialect == 'postgresql' and has_trigram_index(bind):
+        # the trigram GIN index serves LIKE patterns with leading wildcards
+        return query.filter(column.like(pattern, escape='\\')).order_by(
+            func.similarity(column, keyword).desc(), table.c.id)
+
+    if (dialect == 'sqlite' and SQLITE_TRIGRAM and
+            len(keyword) >= MIN_INDEXED_KEYWORD_LENGTH):
+        fts = fts_table(table)
+        phrase = '"{}"'.format(keyword.replace('"', '""'))
+        return query.join(fts, fts.c.rowid == table.c.id).filter(
+            fts.c[column.key].match(phrase)).order_by(fts.c.rank,
+                                                      table.c.id)
+
+    # without an index to rank with, shorter values that contain the keyword
+    # are the closer matches
+    return query.filter(column.like(pattern, escape='\\')).order_by(
+        func.length(column), table.c.id)
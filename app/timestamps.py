@@ -0,0 +1,85 @@
+import datetime
+from dateutil import parser
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+
+UTC = datetime.timezone.utc
+
+
+def utcnow():
+    """Returns the current time
+
+        :return
+            (object): Timezone aware datetime in UTC
+    """
+    return datetime.datetime.now(UTC)
+
+
+def to_utc(value):
+    """Converts a datetime to UTC, treating naive values as UTC
+
+        :arg:
+            value (object): datetime to convert
+
+        :return
+            (object): Timezone aware datetime in UTC
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def format_timestamp(value):
+    """Formats a timestamp for API responses
+
+        :arg:
+            value (object): datetime to format, or None
+
+        :return
+            (string): ISO 8601 timestamp in UTC, e.g.
+            `2017-10-12T10:40:32.123456+00:00`
+    """
+    if value is None:
+        return None
+    return to_utc(value).isoformat()
+
+
+def parse_timestamp(text):
+    """Reads a timestamp provided by a client
+
+        :arg:
+            text (string): ISO 8601 timestamp; UTC is assumed when it has no
+                offset
+
+        :return
+            (object): Timezone aware datetime in UTC, or None if the text is
+            not a valid timestamp
+    """
+    try:
+        return to_utc(parser.parse(text))
+    except (ValueError, OverflowError):
+        return None
+
+
+class UTCDateTime(TypeDecorator):
+    """Timezone aware timestamp column that always hands back UTC datetimes.
+
+    PostgreSQL stores it as ``timestamp with time zone``. SQLite has no
+    timezone support, so values are stored there as naive UTC, which still
+    sorts and compares correctly.
+    """
+
+    impl = DateTime(timezone=True)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = to_utc(value)
+        if dialect.name == 'sqlite':
+            return value.replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return to_utc(value)
@@ -0,0 +1,65 @@
+"""Measures the time and the peak Python memory of deleting a shopping list
+as its item count grows. The database deletes the items, so neither should
+depend on how many there are beyond the DELETE itself.
+
+Usage:
+    python -m benchmarks.bench_cascade_delete [sizes...]
+"""
+import sys
+import tracemalloc
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from benchmarks.common import timed
+from app.models import db
+from app.models import ShoppingListItems
+from flask import json
+
+
+def add_items(flask_api, list_id, start, count):
+    rows = [{
+        'id': start + i,
+        'name': 'item {}'.format(i),
+        'price': 1.0,
+        'quantity': 1.0,
+        'shoppinglist_id': list_id
+    } for i in range(count)]
+    with flask_api.app_context():
+        db.session.execute(ShoppingListItems.__table__.insert(), rows)
+        db.session.commit()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 50000]
+
+    flask_api = make_app()
+    client = flask_api.test_client()
+    headers = register_and_login(client, 'bench_user')
+
+    start = 1
+    print('{:>8} {:>12} {:>16}'.format('items', 'delete (ms)',
+                                        'peak memory (KB)'))
+    for size in sizes:
+        r = client.post('/shoppinglist/',
+                        data={'title': 'bench {}'.format(size)},
+                        headers=headers)
+        list_id = json.loads(r.data)['id']
+        add_items(flask_api, list_id, start, size)
+        start += size
+
+        tracemalloc.start()
+        seconds, r = timed(client.delete,
+                           '/shoppinglist/{}'.format(list_id),
+                           headers=headers)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        assert r.status_code == 200
+        with flask_api.app_context():
+            assert not ShoppingListItems.query.filter_by(
+                shoppinglist_id=list_id).count()
+        print('{:>8} {:>12.1f} {:>16.1f}'.format(size, seconds * 1000,
+                                                  peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compares insert throughput of random primary keys with time-ordered ones.
+
+Random keys land all over the primary key index, while time-ordered keys
+are appended to its end. The gap grows as the table outgrows memory, so
+run it against PostgreSQL (BENCH_DB_URL) with a large row count to see it.
+Random keys also collide with the rows already inserted: a batch that does
+is rolled back and inserted again with new keys, and the collisions are
+counted.
+
+Usage:
+    python -m benchmarks.bench_id_insert [rows] [batch_size]
+"""
+import sys
+from sqlalchemy.exc import IntegrityError
+from benchmarks.common import make_app
+from benchmarks.common import timed
+from app.ids import id_generator
+from app.models import db
+from app.models import Shoppinglists
+from app.models import User
+
+STRATEGIES = ('random', 'time_ordered')
+
+
+def insert_lists(user_id, rows, batch_size):
+    """Inserts shoppinglists a batch at a time
+
+        :return
+            (int): Number of batches retried after a primary key collision
+    """
+    collisions = 0
+    for start in range(0, rows, batch_size):
+        while True:
+            db.session.add_all([
+                Shoppinglists(title='list {}'.format(start + i),
+                              user_id=user_id)
+                for i in range(min(batch_size, rows - start))])
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                # a random ID already taken: new lists get new IDs
+                db.session.rollback()
+                collisions += 1
+    return collisions
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    for strategy in STRATEGIES:
+        flask_api = make_app()
+        id_generator.strategy = strategy
+        id_generator.set_worker_id(0)
+
+        with flask_api.app_context():
+            user = User(username='bench_user', password_hash='-',
+                        answer='yes', security_question='bench?')
+            user.save()
+            seconds, collisions = timed(insert_lists, user.id, rows,
+                                        batch_size)
+
+        print('{:<13} {:>10.0f} rows/sec {:>6} batches retried'.format(
+            strategy, rows / seconds, collisions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Compares the time to serialise a listing of 10k items with `jsonify`,
+pretty-printed as in debug configs and compact, against each JSON library
+`make_response` can use.
+
+Usage:
+    python -m benchmarks.bench_json [items] [repeats]
+"""
+import statistics
+import sys
+from flask import jsonify
+from app import create_app
+from app.serialization import BACKENDS
+from benchmarks.common import timed
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    payload = [{
+        'id': 1266168820295232 + i,
+        'name': 'item {}'.format(i),
+        'price': i * 1.25,
+        'quantity': 1.0
+    } for i in range(items)]
+
+    flask_api = create_app('testing')
+
+    def jsonify_with(pretty):
+        def serialise(data):
+            flask_api.config['JSONIFY_PRETTYPRINT_REGULAR'] = pretty
+            return jsonify(data).get_data()
+        return serialise
+
+    candidates = [('jsonify (pretty)', jsonify_with(True)),
+                  ('jsonify', jsonify_with(False))] + BACKENDS
+
+    print('{} items'.format(items))
+    print('{:<18} {:>10} {:>12}'.format('serialiser', 'ms', 'size (KB)'))
+    with flask_api.test_request_context():
+        for name, dumps in candidates:
+            size = len(dumps(payload))
+            median = statistics.median(timed(dumps, payload)[0]
+                                       for _ in range(repeats))
+            print('{:<18} {:>10.2f} {:>12.1f}'.format(name, median * 1000,
+                                                       size / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Compares what a client pays to show each of a user's shopping lists with
+its item count and total cost: downloading every list's items and adding
+them up, against asking for `?include=totals`, which reads the totals kept
+on each list.
+
+Usage:
+    python -m benchmarks.bench_list_totals [lists] [items_per_list]
+"""
+import sys
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from benchmarks.common import timed
+from app import recompute_list_totals
+from app.models import db
+from app.models import Shoppinglists
+from app.models import ShoppingListItems
+from app.models import User
+from app.timestamps import utcnow
+from flask import json
+
+
+def add_lists(flask_api, username, lists, items_per_list):
+    with flask_api.app_context():
+        user_id = User.query.filter_by(username=username).first().id
+        now = utcnow()
+        list_rows = [{
+            'id': list_id,
+            'title': 'list {}'.format(list_id),
+            'created_on': now,
+            'modified_on': now,
+            'user_id': user_id
+        } for list_id in range(1, lists + 1)]
+        db.session.execute(Shoppinglists.__table__.insert(), list_rows)
+
+        item_rows = [{
+            'id': list_id * items_per_list + i,
+            'name': 'item {}'.format(i),
+            'price': 1.5,
+            'quantity': 2.0,
+            'shoppinglist_id': list_id
+        } for list_id in range(1, lists + 1) for i in range(items_per_list)]
+        db.session.execute(ShoppingListItems.__table__.insert(), item_rows)
+
+        # the rows were inserted behind the API's back
+        recompute_list_totals(Shoppinglists.query)
+        db.session.commit()
+
+
+def main():
+    lists = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    items_per_list = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    flask_api = make_app()
+    client = flask_api.test_client()
+    headers = register_and_login(client, 'bench_user')
+    add_lists(flask_api, 'bench_user', lists, items_per_list)
+
+    def totals_on_client():
+        r = client.get('/shoppinglist/', headers=headers)
+        size = len(r.data)
+        totals = {}
+        for shopping_list in json.loads(r.data):
+            r = client.get(
+                '/shoppinglist/{}/items/'.format(shopping_list['id']),
+                headers=headers)
+            size += len(r.data)
+            items = json.loads(r.data)
+            totals[shopping_list['id']] = (
+                len(items),
+                sum(item['price'] * item['quantity'] for item in items))
+        return size, totals
+
+    def totals_on_server():
+        r = client.get('/shoppinglist/?include=totals', headers=headers)
+        return len(r.data), {
+            shopping_list['id']: (shopping_list['item_count'],
+                                  shopping_list['total'])
+            for shopping_list in json.loads(r.data)}
+
+    print('{} lists of {} items'.format(lists, items_per_list))
+    print('{:<10} {:>10} {:>14}'.format('totals', 'time (ms)', 'payload (KB)'))
+    results = []
+    for name, fetch in (('client', totals_on_client),
+                        ('server', totals_on_server)):
+        seconds, (size, totals) = timed(fetch)
+        results.append(totals)
+        print('{:<10} {:>10.1f} {:>14.1f}'.format(name, seconds * 1000,
+                                                  size / 1024))
+
+    assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Measures login requests/sec for a range of bcrypt cost factors.
+
+Usage:
+    python -m benchmarks.bench_login [logins] [client_threads]
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from benchmarks.common import timed
+
+COST_FACTORS = (4, 8, 10, 12)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    client_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    credentials = {'username': 'bench_user', 'password': 'bench_password'}
+
+    for rounds in COST_FACTORS:
+        flask_api = make_app(BCRYPT_LOG_ROUNDS=rounds)
+        register_and_login(flask_api.test_client(), **credentials)
+
+        def login(_):
+            r = flask_api.test_client().post('/user/login/',
+                                             data=credentials)
+            return r.status_code
+
+        def login_concurrently():
+            with ThreadPoolExecutor(max_workers=client_threads) as executor:
+                return list(executor.map(login, range(total)))
+
+        seconds, statuses = timed(login_concurrently)
+
+        assert set(statuses) == {200}
+        print('cost {:>2}: {:>8.1f} logins/sec'.format(rounds,
+                                                        total / seconds))
+
+
+if __name__ == '__main__':
+    main()
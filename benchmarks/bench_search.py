@@ -0,0 +1,83 @@
+"""Measures `?q=` search latency on a shopping list as its item count grows,
+comparing the indexed search backend with a plain `LIKE '%keyword%'` scan.
+
+Usage:
+    python -m benchmarks.bench_search [sizes...]
+"""
+import random
+import statistics
+import sys
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from benchmarks.common import timed
+from app.models import db
+from app.models import ShoppingListItems
+from app.search import search
+from flask import json
+
+WORDS = ('apple', 'bread', 'butter', 'cheese', 'coffee', 'eggs', 'flour',
+         'honey', 'juice', 'lemon', 'milk', 'onion', 'pasta', 'rice',
+         'salt', 'sugar', 'tea', 'tomato', 'water', 'yoghurt')
+REPEATS = 20
+
+# a selective keyword and one that matches nothing
+KEYWORDS = ('honey lemon', 'zucchini')
+
+
+def add_items(flask_api, list_id, start, count):
+    rows = [{
+        'id': start + i,
+        'name': '{} {} {}'.format(random.choice(WORDS), random.choice(WORDS),
+                                  start + i),
+        'price': 1.0,
+        'quantity': 1.0,
+        'shoppinglist_id': list_id
+    } for i in range(count)]
+    with flask_api.app_context():
+        db.session.execute(ShoppingListItems.__table__.insert(), rows)
+        db.session.commit()
+
+
+def median_ms(function):
+    return statistics.median(timed(function)[0]
+                             for _ in range(REPEATS)) * 1000
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 100000]
+    random.seed(1)
+
+    flask_api = make_app()
+    client = flask_api.test_client()
+    headers = register_and_login(client, 'bench_user')
+    r = client.post('/shoppinglist/', data={'title': 'bench'},
+                    headers=headers)
+    list_id = json.loads(r.data)['id']
+
+    def indexed_search(keyword):
+        with flask_api.app_context():
+            search(ShoppingListItems.query.filter_by(shoppinglist_id=list_id),
+                   ShoppingListItems.name, keyword).limit(20).all()
+
+    def like_scan(keyword):
+        with flask_api.app_context():
+            ShoppingListItems.query.filter(
+                ShoppingListItems.shoppinglist_id == list_id,
+                ShoppingListItems.name.like('%{}%'.format(keyword))
+            ).limit(20).all()
+
+    print('{:>8} {:<14} {:>12} {:>12}'.format('items', 'keyword',
+                                             'search (ms)', 'LIKE (ms)'))
+    total = 0
+    for size in sizes:
+        add_items(flask_api, list_id, total + 1, size - total)
+        total = size
+        for keyword in KEYWORDS:
+            print('{:>8} {:<14} {:>12.2f} {:>12.2f}'.format(
+                size, keyword,
+                median_ms(lambda: indexed_search(keyword)),
+                median_ms(lambda: like_scan(keyword))))
+
+
+if __name__ == '__main__':
+    main()
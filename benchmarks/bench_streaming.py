@@ -0,0 +1,84 @@
+"""Compares listing all items of a shopping list in one response with
+streaming them (`?stream=true`) as the list grows: the time to the first
+byte, the total time and the peak Python memory of the request. A streamed
+response should reach the client sooner and use about the same memory
+however many items there are; below STREAM_MIN_ROWS items it is sent in one
+piece, as that takes less memory.
+
+Usage:
+    python -m benchmarks.bench_streaming [sizes...]
+"""
+import sys
+import time
+import tracemalloc
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from app.models import db
+from app.models import ShoppingListItems
+from flask import json
+
+
+def add_items(flask_api, list_id, start, count):
+    rows = [{
+        'id': start + i,
+        'name': 'item {}'.format(i),
+        'price': 1.0,
+        'quantity': 1.0,
+        'shoppinglist_id': list_id
+    } for i in range(count)]
+    with flask_api.app_context():
+        db.session.execute(ShoppingListItems.__table__.insert(), rows)
+        db.session.commit()
+
+
+def fetch(client, url, headers):
+    """Reads a response a piece at a time, as a client would
+
+        :return
+            (tuple): Seconds to the first and to the last byte, peak memory
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    r = client.get(url, headers=headers)
+    for _ in r.iter_encoded():
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+    r.close()
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert r.status_code == 200
+    return first_byte, total, peak
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [1000, 10000, 50000]
+
+    flask_api = make_app()
+    client = flask_api.test_client()
+    headers = register_and_login(client, 'bench_user')
+
+    start = 1
+    print('{:>8} {:<10} {:>16} {:>12} {:>16}'.format(
+        'items', 'mode', 'first byte (ms)', 'total (ms)', 'peak memory (KB)'))
+    for size in sizes:
+        r = client.post('/shoppinglist/',
+                        data={'title': 'bench {}'.format(size)},
+                        headers=headers)
+        list_id = json.loads(r.data)['id']
+        add_items(flask_api, list_id, start, size)
+        start += size
+
+        url = '/shoppinglist/{}/items/'.format(list_id)
+        for mode, query_string in (('buffered', ''),
+                                   ('streamed', '?stream=true')):
+            first_byte, total, peak = fetch(client, url + query_string,
+                                            headers)
+            print('{:>8} {:<10} {:>16.1f} {:>12.1f} {:>16.1f}'.format(
+                size, mode, first_byte * 1000, total * 1000, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
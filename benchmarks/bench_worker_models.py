@@ -0,0 +1,77 @@
+"""Compares request throughput of a single-threaded worker, the only safe
+option while the authenticated user lived in a module global, against a
+threaded worker that serves requests concurrently.
+
+Threads only help while requests wait, e.g. on a database across the
+network; CPU-bound requests hold the GIL and gain nothing. Each request
+therefore waits `latency_ms` (default 5) as a stand-in for the database
+round trips of a production deployment; pass 0 to time the local SQLite
+database alone.
+
+Usage:
+    python -m benchmarks.bench_worker_models [requests] [client_threads]
+        [latency_ms]
+"""
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request
+from urllib.request import urlopen
+from werkzeug.serving import make_server
+from benchmarks.common import make_app
+from benchmarks.common import register_and_login
+from benchmarks.common import timed
+
+
+def serve(flask_api, threaded):
+    server = make_server('127.0.0.1', 0, flask_api, threaded=threaded)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def fire(url, headers, total, client_threads):
+    def get(_):
+        with urlopen(Request(url, headers=headers)) as response:
+            return response.status
+
+    with ThreadPoolExecutor(max_workers=client_threads) as executor:
+        return list(executor.map(get, range(total)))
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    client_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 5) / 1000
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    flask_api = make_app()
+    waiting = threading.Event()
+
+    @flask_api.before_request
+    def wait_for_database():
+        if waiting.is_set():
+            time.sleep(latency)
+
+    client = flask_api.test_client()
+    headers = register_and_login(client, 'bench_user')
+    for i in range(50):
+        client.post('/shoppinglist/', data={'title': 'list {}'.format(i)},
+                    headers=headers)
+    waiting.set()
+
+    for label, threaded in (('single-threaded', False), ('threaded', True)):
+        server = serve(flask_api, threaded)
+        url = 'http://127.0.0.1:{}/shoppinglist/'.format(server.port)
+        seconds, statuses = timed(fire, url, headers, total, client_threads)
+        server.shutdown()
+
+        assert set(statuses) == {200}
+        print('{:<16} {:>8.1f} requests/sec'.format(label, total / seconds))
+
+
+if __name__ == '__main__':
+    main()
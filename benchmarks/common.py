@@ -0,0 +1,93 @@
+"""Helpers shared by the benchmark scripts in this directory.
+
+The benchmarks run against the database given in the `BENCH_DB_URL`
+environment variable, falling back to a throw-away SQLite file that is
+removed when the benchmark exits.
+"""
+import atexit
+import os
+import tempfile
+import time
+from flask import json
+from app import create_app
+from app.models import db
+
+
+def make_app(config_mode='testing', **config):
+    """Creates an application bound to the benchmark database with a fresh
+    schema
+
+        :arg:
+            config_mode (string): Name of the configuration to use
+            config (dict): Extra configuration values to apply
+
+        :return
+            (object): Flask application
+    """
+    database_url = os.getenv('BENCH_DB_URL')
+    path = None
+    if not database_url:
+        handle, path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        database_url = 'sqlite:///' + path
+
+    flask_api = create_app(config_mode)
+    flask_api.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    flask_api.config.update(config)
+    if path is not None:
+        atexit.register(remove_database, flask_api, path)
+
+    with flask_api.app_context():
+        db.drop_all()
+        db.create_all()
+    return flask_api
+
+
+def remove_database(flask_api, path):
+    """Closes an application's database connections and deletes its SQLite
+    file
+
+        :arg:
+            flask_api (object): Flask application
+            path (string): Path of the SQLite file
+    """
+    with flask_api.app_context():
+        db.session.remove()
+        db.get_engine(flask_api).dispose()
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def register_and_login(client, username, password='bench_password'):
+    """Registers a user and returns the headers to authenticate as them
+
+        :arg:
+            client (object): Test client or compatible HTTP session
+            username (string): Name of the user to create
+            password (string): Password of the user to create
+
+        :return
+            (dict): Authorization header
+    """
+    credentials = {
+        'username': username,
+        'password': password,
+        'security_question': 'bench?',
+        'answer': 'yes'
+    }
+    client.post('/user/register/', data=credentials)
+    r = client.post('/user/login/', data=credentials)
+    token = json.loads(r.data)['token']
+    return {'Authorization': 'Bearer ' + token}
+
+
+def timed(function, *args, **kwargs):
+    """Runs a function and measures how long it takes
+
+        :return
+            (tuple): Seconds taken and the function's return value
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
@@ -0,0 +1,32 @@
+"""Gunicorn settings, used with `gunicorn -c gunicorn.conf.py run:app`"""
+import os
+
+bind = '0.0.0.0:{}'.format(os.getenv('PORT', '8000'))
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+
+def pre_fork(server, worker):
+    # runs in the master: reserve an ID slot no live worker is using
+    used_slots = {getattr(live_worker, 'id_slot', None)
+                  for live_worker in server.WORKERS.values()}
+    worker.id_slot = min(slot for slot in range(64) if slot not in used_slots)
+
+    if server.cfg.preload_app:
+        # a worker must not inherit the master's database connections:
+        # closing them here, before forking, leaves every worker to open its
+        # own. Closing them in a worker would also end the master's sessions
+        from app.models import db
+        flask_app = server.app.wsgi()
+        with flask_app.app_context():
+            for bind in [None] + flask_app.config['REPLICA_BINDS']:
+                db.get_engine(flask_app, bind=bind).dispose()
+
+
+def post_fork(server, worker):
+    from app.ids import id_generator
+
+    # primary keys generated by different workers must never collide; a
+    # configured WORKER_ID still takes precedence over the slot
+    id_generator.set_slot(worker.id_slot)
@@ -1,4 +1,16 @@
 import os
+import tempfile
+
+
+def optional_int(value):
+    """Converts an optional setting to an integer, keeping None"""
+    return None if value is None else int(value)
+
+
+def replica_binds(urls):
+    """Names the read replica database URLs as binds"""
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {'replica_{}'.format(i): url for i, url in enumerate(urls, 1)}
 
 
 class Config(object):
@@ -12,10 +24,91 @@ class Config(object):
     SECRET = os.urandom(24)
     SQLALCHEMY_DATABASE_URI = os.getenv('db_url')
 
+    # connection pool of each worker process; unset values keep the
+    # library defaults. Connections are recycled after SQLALCHEMY_POOL_RECYCLE
+    # seconds and, with SQLALCHEMY_POOL_PRE_PING, tested before every use.
+    # PostgreSQL cancels statements running longer than
+    # SQLALCHEMY_STATEMENT_TIMEOUT milliseconds
+    SQLALCHEMY_POOL_SIZE = optional_int(os.getenv('DB_POOL_SIZE'))
+    SQLALCHEMY_MAX_OVERFLOW = optional_int(os.getenv('DB_MAX_OVERFLOW'))
+    SQLALCHEMY_POOL_TIMEOUT = optional_int(os.getenv('DB_POOL_TIMEOUT'))
+    SQLALCHEMY_POOL_RECYCLE = optional_int(os.getenv('DB_POOL_RECYCLE'))
+    SQLALCHEMY_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '0') == '1'
+    SQLALCHEMY_STATEMENT_TIMEOUT = optional_int(
+        os.getenv('DB_STATEMENT_TIMEOUT'))
+
+    # read replicas, as a comma separated list of database URLs. Reads of
+    # safe requests go to one of them, except for users who wrote within the
+    # last REPLICA_PIN_SECONDS; those pins are shared by the workers on a
+    # host through the REPLICA_PIN_DB file
+    SQLALCHEMY_BINDS = replica_binds(os.getenv('db_replica_urls'))
+    REPLICA_BINDS = sorted(SQLALCHEMY_BINDS)
+    REPLICA_PIN_SECONDS = float(os.getenv('REPLICA_PIN_SECONDS', 10))
+    REPLICA_PIN_DB = os.getenv(
+        'REPLICA_PIN_DB',
+        os.path.join(tempfile.gettempdir(), 'shoppinglist_primary_pins.db'))
+
+    # most items a single request may create
+    MAX_BULK_ITEMS = int(os.getenv('MAX_BULK_ITEMS', 1000))
+
+    # responses of at least COMPRESS_MIN_SIZE bytes are compressed, at
+    # COMPRESS_LEVEL from 1 (fastest) to 9 (smallest), with the best of
+    # brotli (if installed), gzip and deflate that the client accepts
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # JSON library responses are serialised with: orjson, ujson or json (the
+    # standard library); auto picks the fastest installed
+    JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'auto')
+
+    # rows read from the database at a time for streamed responses, and the
+    # fewest rows streamed: smaller collections are sent in one piece
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 1000))
+    STREAM_MIN_ROWS = int(os.getenv('STREAM_MIN_ROWS', 1000))
+
+    # serve the connection pool's usage at /status/pool
+    PUBLISH_POOL_STATS = os.getenv('PUBLISH_POOL_STATS', '0') == '1'
+
+    # how primary keys are generated: time_ordered, sequence or random.
+    # time_ordered IDs need a worker ID unique to each running worker
+    # process: WORKER_ID (0-63) if set, else the slot gunicorn.conf.py gives
+    # each worker on its host, combined with the host's NODE_ID (0-7) when
+    # several hosts run the app (MULTI_HOST, set on Heroku dynos, which
+    # cannot be given a NODE_ID each). Without one there, the database's
+    # sequence assigns IDs
+    WORKER_ID = os.getenv('WORKER_ID')
+    NODE_ID = os.getenv('NODE_ID')
+    MULTI_HOST = os.getenv('MULTI_HOST', '1' if os.getenv('DYNO') else '0') \
+        == '1'
+    ID_GENERATOR = os.getenv(
+        'ID_GENERATOR',
+        'sequence' if MULTI_HOST and WORKER_ID is None and NODE_ID is None
+        else 'time_ordered')
+
+    # bcrypt cost factor and the number of threads passwords are hashed on
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+
+    # file shared by all workers on a host to record revoked tokens, and how
+    # often (in seconds) each worker picks up tokens revoked by the others
+    TOKEN_REVOCATION_DB = os.getenv(
+        'TOKEN_REVOCATION_DB',
+        os.path.join(tempfile.gettempdir(), 'shoppinglist_revoked_tokens.db'))
+    TOKEN_REVOCATION_REFRESH = float(os.getenv('TOKEN_REVOCATION_REFRESH', 5))
+
+    # file shared by all workers on a host to record recent registrations,
+    # so that none of them keeps turning a new user away as unknown. With
+    # MULTI_HOST, unknown usernames are not cached, so it goes unused
+    REGISTRATION_LOG_DB = os.getenv(
+        'REGISTRATION_LOG_DB',
+        os.path.join(tempfile.gettempdir(), 'shoppinglist_registrations.db'))
+
 
 class DevelopmentConfig(Config):
     """Configurations for Development environment"""
     DEBUG = True
+    PUBLISH_POOL_STATS = True
+    BCRYPT_LOG_ROUNDS = 8
 
 
 class TestingConfig(Config):
@@ -24,6 +117,7 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = \
         'postgresql://postgres:1@localhost/test_db'
     DEBUG = True
+    BCRYPT_LOG_ROUNDS = 4  # the minimum bcrypt allows, keeps tests fast
 
 
 class StagingConfig(Config):
@@ -37,6 +131,16 @@ class ProductionConfig(Config):
     TESTING = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
 
+    # sized so that the default two workers stay within the 20 connections
+    # of a small hosted PostgreSQL plan
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+    SQLALCHEMY_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    SQLALCHEMY_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    SQLALCHEMY_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    SQLALCHEMY_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT',
+                                                 30000))
+
 
 configurations = {
     'development': DevelopmentConfig,
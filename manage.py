@@ -3,7 +3,9 @@ from flask_script import Manager
 from flask_migrate import Migrate
 from flask_migrate import MigrateCommand
 from app.models import db
+from app.models import Shoppinglists
 from app import create_app
+from app import recompute_list_totals
 
 
 app = create_app(config_mode=os.environ.get('FLASK_CONFIG'))
@@ -12,5 +14,15 @@ manager = Manager(app)
 
 manager.add_command('db', MigrateCommand)
 
+
+@manager.command
+def repair_list_totals():
+    """Recomputes the item counts and total costs kept on shoppinglists from
+    their items"""
+    repaired = recompute_list_totals(Shoppinglists.query)
+    db.session.commit()
+    print('Recomputed the totals of {} shoppinglists'.format(repaired))
+
+
 if __name__ == '__main__':
     manager.run()
@@ -0,0 +1,35 @@
+"""index list and item lookups
+
+Every list query filters shoppinglists by user_id (and by title when
+checking for duplicates) and every item query filters shoppinglist_items
+by shoppinglist_id (and by name, price and quantity when checking for
+duplicates). Without these indexes each of them is a sequential scan.
+
+Revision ID: 2a3b4c5d6e7f
+Revises: 1f2b3c4d5e6f
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2a3b4c5d6e7f'
+down_revision = '1f2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shoppinglists_user_id_title', 'shoppinglists',
+                    ['user_id', 'title'])
+    op.create_index('ix_shoppinglist_items_list_id_name',
+                    'shoppinglist_items',
+                    ['shoppinglist_id', 'name', 'price', 'quantity'])
+
+
+def downgrade():
+    op.drop_index('ix_shoppinglist_items_list_id_name',
+                  table_name='shoppinglist_items')
+    op.drop_index('ix_shoppinglists_user_id_title',
+                  table_name='shoppinglists')
@@ -0,0 +1,83 @@
+"""substring search indexes
+
+Adds a trigram GIN index on PostgreSQL, and an FTS5 trigram shadow table
+kept in sync by triggers on SQLite, for the columns searched with `?q=`.
+
+Revision ID: 3b4c5d6e7f80
+Revises: 2a3b4c5d6e7f
+Create Date: 2026-10-18 19:45:00.000000
+
+"""
+import sqlite3
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b4c5d6e7f80'
+down_revision = '2a3b4c5d6e7f'
+branch_labels = None
+depends_on = None
+
+SEARCHABLE_COLUMNS = (
+    ('shoppinglists', 'title'),
+    ('shoppinglist_items', 'name'),
+)
+
+SQLITE_STATEMENTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+    "{column}, content='{table}', content_rowid='id', tokenize='trigram')",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} "
+    "BEGIN INSERT INTO {fts} (rowid, {column}) "
+    "VALUES (new.id, new.{column}); END",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} "
+    "BEGIN INSERT INTO {fts} ({fts}, rowid, {column}) "
+    "VALUES ('delete', old.id, old.{column}); END",
+
+    "CREATE TRIGGER IF NOT EXISTS {fts}_update "
+    "AFTER UPDATE OF {column} ON {table} "
+    "BEGIN INSERT INTO {fts} ({fts}, rowid, {column}) "
+    "VALUES ('delete', old.id, old.{column}); "
+    "INSERT INTO {fts} (rowid, {column}) "
+    "VALUES (new.id, new.{column}); END",
+
+    # index the rows that already exist
+    "INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # pg_trgm ships with the contrib package; without it searches fall
+        # back to scanning with LIKE
+        if not op.get_bind().execute("SELECT 1 FROM pg_available_extensions "
+                                     "WHERE name = 'pg_trgm'").scalar():
+            return
+
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, column in SEARCHABLE_COLUMNS:
+            op.execute('CREATE INDEX ix_{0}_{1}_trgm ON {0} '
+                       'USING gin ({1} gin_trgm_ops)'.format(table, column))
+
+    elif dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34, 0):
+        for table, column in SEARCHABLE_COLUMNS:
+            for statement in SQLITE_STATEMENTS:
+                op.execute(statement.format(table=table, column=column,
+                                            fts=table + '_fts'))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    for table, column in SEARCHABLE_COLUMNS:
+        if dialect == 'postgresql':
+            op.execute('DROP INDEX IF EXISTS ix_{}_{}_trgm'.format(table,
+                                                                   column))
+        elif dialect == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute('DROP TRIGGER IF EXISTS {}_fts_{}'.format(
+                    table, trigger))
+            op.execute('DROP TABLE IF EXISTS {}_fts'.format(table))
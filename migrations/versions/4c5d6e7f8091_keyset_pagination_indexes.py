@@ -0,0 +1,32 @@
+"""keyset pagination indexes
+
+Lists and items are paged through in id order within a user or a list.
+These indexes let each page seek straight to the first row after the
+cursor without sorting.
+
+Revision ID: 4c5d6e7f8091
+Revises: 3b4c5d6e7f80
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4c5d6e7f8091'
+down_revision = '3b4c5d6e7f80'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shoppinglists_user_id_id', 'shoppinglists',
+                    ['user_id', 'id'])
+    op.create_index('ix_shoppinglist_items_list_id_id', 'shoppinglist_items',
+                    ['shoppinglist_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shoppinglist_items_list_id_id',
+                  table_name='shoppinglist_items')
+    op.drop_index('ix_shoppinglists_user_id_id', table_name='shoppinglists')
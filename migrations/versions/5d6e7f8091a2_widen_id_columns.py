@@ -0,0 +1,60 @@
+"""widen id columns
+
+Time-ordered IDs are larger than a 32-bit integer can hold, so primary and
+foreign key columns become BIGINT. SQLite's INTEGER is already 64-bit.
+
+Revision ID: 5d6e7f8091a2
+Revises: 4c5d6e7f8091
+Create Date: 2026-10-18 20:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d6e7f8091a2'
+down_revision = '4c5d6e7f8091'
+branch_labels = None
+depends_on = None
+
+ID_COLUMNS = (
+    ('users', 'id'),
+    ('shoppinglists', 'id'),
+    ('shoppinglists', 'user_id'),
+    ('shoppinglist_items', 'id'),
+    ('shoppinglist_items', 'shoppinglist_id'),
+)
+
+# sequences created for the serial primary keys, used by the `sequence`
+# ID strategy
+SEQUENCES = ('users_id_seq', 'shoppinglists_id_seq',
+             'shoppinglist_items_id_seq')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column in ID_COLUMNS:
+        op.alter_column(table, column, type_=sa.BigInteger(),
+                        existing_type=sa.Integer())
+
+    if op.get_bind().dialect.server_version_info >= (10,):
+        for sequence in SEQUENCES:
+            op.execute('ALTER SEQUENCE IF EXISTS {} AS bigint'.format(
+                sequence))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    if op.get_bind().dialect.server_version_info >= (10,):
+        for sequence in SEQUENCES:
+            op.execute('ALTER SEQUENCE IF EXISTS {} AS integer'.format(
+                sequence))
+
+    for table, column in reversed(ID_COLUMNS):
+        op.alter_column(table, column, type_=sa.Integer(),
+                        existing_type=sa.BigInteger())
@@ -0,0 +1,75 @@
+"""native timestamps
+
+Shoppinglist timestamps were `YYYY-MM-DD HH:MM:SS` strings, with `--` as
+the modification time of lists that were never updated. They become
+timezone aware timestamps, indexed per user so that lists can be filtered
+by when they were created or last modified. Lists that were never updated
+count as modified when they were created. Existing values are taken to be
+in UTC.
+
+Revision ID: 6e7f8091a2b3
+Revises: 5d6e7f8091a2
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e7f8091a2b3'
+down_revision = '5d6e7f8091a2'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_shoppinglists_user_id_modified_on', ['user_id', 'modified_on']),
+    ('ix_shoppinglists_user_id_created_on', ['user_id', 'created_on']),
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    op.execute("UPDATE shoppinglists SET modified_on = created_on "
+               "WHERE modified_on = '--'")
+
+    if dialect == 'sqlite':
+        # SQLite keeps timestamps as text whatever the declared type, so
+        # only the format changes, to the one SQLAlchemy writes
+        for column in ('created_on', 'modified_on'):
+            op.execute("UPDATE shoppinglists SET {0} = {0} || '.000000' "
+                       "WHERE length({0}) = 19".format(column))
+    else:
+        for column in ('created_on', 'modified_on'):
+            op.alter_column(
+                'shoppinglists', column,
+                type_=sa.DateTime(timezone=True),
+                existing_type=sa.String(length=20),
+                existing_nullable=False,
+                postgresql_using="{}::timestamp AT TIME ZONE 'UTC'".format(
+                    column))
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'shoppinglists', columns)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    for name, columns in reversed(INDEXES):
+        op.drop_index(name, table_name='shoppinglists')
+
+    if dialect == 'sqlite':
+        for column in ('created_on', 'modified_on'):
+            op.execute("UPDATE shoppinglists SET {0} = substr({0}, 1, 19)"
+                       .format(column))
+    else:
+        for column in ('created_on', 'modified_on'):
+            op.alter_column(
+                'shoppinglists', column,
+                type_=sa.String(length=20),
+                existing_type=sa.DateTime(timezone=True),
+                existing_nullable=False,
+                postgresql_using="to_char({} AT TIME ZONE 'UTC', "
+                                 "'YYYY-MM-DD HH24:MI:SS')".format(column))
@@ -0,0 +1,48 @@
+"""unique titles and items
+
+A user's shoppinglist titles, and the name, price and quantity of the items
+in a list, are now unique in the database rather than checked with a query
+before every write. Duplicates left by earlier races keep their data: all
+but the oldest get their ID appended to the title or name.
+
+Revision ID: 7f8091a2b3c4
+Revises: 6e7f8091a2b3
+Create Date: 2026-10-18 20:45:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7f8091a2b3c4'
+down_revision = '6e7f8091a2b3'
+branch_labels = None
+depends_on = None
+
+# index name, table, columns, column that is renamed to resolve duplicates
+UNIQUE_INDEXES = (
+    ('ix_shoppinglists_user_id_title', 'shoppinglists',
+     ['user_id', 'title'], 'title'),
+    ('ix_shoppinglist_items_list_id_name', 'shoppinglist_items',
+     ['shoppinglist_id', 'name', 'price', 'quantity'], 'name'),
+)
+
+
+def upgrade():
+    for name, table, columns, renamed_column in UNIQUE_INDEXES:
+        same_row = ' AND '.join('earlier.{0} = {1}.{0}'.format(column, table)
+                                for column in columns)
+        op.execute(
+            "UPDATE {table} SET {column} = substr({column}, 1, 80) || ' #' "
+            "|| id WHERE EXISTS (SELECT 1 FROM {table} AS earlier "
+            "WHERE {same_row} AND earlier.id < {table}.id)".format(
+                table=table, column=renamed_column, same_row=same_row))
+
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, columns, unique=True)
+
+
+def downgrade():
+    for name, table, columns, renamed_column in reversed(UNIQUE_INDEXES):
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, columns)
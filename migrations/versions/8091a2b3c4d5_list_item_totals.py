@@ -0,0 +1,61 @@
+"""list item totals
+
+Shoppinglists keep the number of their items, their total cost (price times
+quantity) and when an item last changed, so that list views do not
+aggregate the items. The counts and costs of existing lists are computed
+from their items; when their items last changed is unknown.
+
+Revision ID: 8091a2b3c4d5
+Revises: 7f8091a2b3c4
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8091a2b3c4d5'
+down_revision = '7f8091a2b3c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shoppinglists', sa.Column(
+        'item_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('shoppinglists', sa.Column(
+        'total_cost', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('shoppinglists', sa.Column(
+        'last_item_change', sa.DateTime(timezone=True), nullable=True))
+
+    op.execute(
+        "UPDATE shoppinglists SET "
+        "item_count = (SELECT count(*) FROM shoppinglist_items "
+        "WHERE shoppinglist_id = shoppinglists.id), "
+        "total_cost = (SELECT coalesce(sum(price * quantity), 0) "
+        "FROM shoppinglist_items "
+        "WHERE shoppinglist_id = shoppinglists.id)")
+
+
+def downgrade():
+    drop_list_columns('last_item_change', 'total_cost', 'item_count')
+
+
+def drop_list_columns(*columns):
+    # SQLite before 3.35 cannot drop columns, batch mode copies the table
+    # without them instead. The copy loses the search index triggers of the
+    # original, which are recreated from their stored definitions
+    bind = op.get_bind()
+    triggers = []
+    if bind.dialect.name == 'sqlite':
+        triggers = [sql for sql, in bind.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'shoppinglists'")]
+
+    with op.batch_alter_table('shoppinglists') as batch_op:
+        for column in columns:
+            batch_op.drop_column(column)
+
+    for sql in triggers:
+        op.execute(sql)
@@ -0,0 +1,48 @@
+"""list versions
+
+Shoppinglists get a version that increases whenever the list or one of its
+items changes, from which the ETags of the list, its items and each item
+are made.
+
+Revision ID: 91a2b3c4d5e6
+Revises: 8091a2b3c4d5
+Create Date: 2026-10-18 21:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '91a2b3c4d5e6'
+down_revision = '8091a2b3c4d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shoppinglists', sa.Column(
+        'version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    drop_list_columns('version')
+
+
+def drop_list_columns(*columns):
+    # SQLite before 3.35 cannot drop columns, batch mode copies the table
+    # without them instead. The copy loses the search index triggers of the
+    # original, which are recreated from their stored definitions
+    bind = op.get_bind()
+    triggers = []
+    if bind.dialect.name == 'sqlite':
+        triggers = [sql for sql, in bind.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'shoppinglists'")]
+
+    with op.batch_alter_table('shoppinglists') as batch_op:
+        for column in columns:
+            batch_op.drop_column(column)
+
+    for sql in triggers:
+        op.execute(sql)
@@ -1,13 +1,19 @@
 import os
 from flasgger import Swagger
 from app import create_app
+from app.compression import compressor
 
 
 # Initialize flask_api
 app = create_app(os.environ.get('FLASK_CONFIG'))
 
 # Initialize swagger documentation plugin
-Swagger(app, template_file='../doc.yaml')
+swagger = Swagger(app, template_file='../doc.yaml')
+
+# the spec only changes with a deploy; compress it once rather than on
+# every request
+for spec in swagger.config['specs']:
+    compressor.precompress(app, spec['route'])
 
 if __name__ == '__main__':
     app.run()
@@ -1,13 +1,39 @@
+import os
 import time
+import zlib
 import datetime
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from flask import json
+from sqlalchemy import event
+from sqlalchemy import exc
 from unittest import TestCase
 from app import create_app
+from app import existing_items_query
+from app import get_timestamp_filters
+from app import item_query
+from app import items_query
+from app import recompute_list_totals
+from app import shoppinglist_query
+from app import shoppinglists_query
 from app.models import db
 from app.models import User
 from app.models import Shoppinglists
 from app.models import ShoppingListItems
 from app.models import generate_random_id
+from app.cache import TTLCache
+from app.compression import compressor
+from app.database import MonitoredQueuePool
+from app.ids import IdGenerator
+from app.ids import MAX_WORKER_ID
+from app.ids import SEQUENCE_BITS
+from app.hashing import password_hasher
+from app.hashing import sha1_hash
+from app.pagination import page_query
+from app.revocation import RevocationStore
+from app.serialization import BACKENDS
+from app.serialization import JSONSerializer
 import app
 
 
@@ -61,6 +87,343 @@ class TestModels(TestCase):
         self.shoppinglist_items = None
 
 
+class TestTTLCache(TestCase):
+    def setUp(self):
+        self.cache = TTLCache(max_size=2, ttl=60)
+
+    def test_cache_counts_hits_and_misses(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_cache_evicts_least_recently_used(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_cache_entries_expire(self):
+        self.cache.set('a', 1, expires_at=time.time() - 1)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_cache_invalidate(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.invalidate(lambda value: value == 1)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('b'), 2)
+
+
+class TestIdGenerator(TestCase):
+    def setUp(self):
+        self.id_generator = IdGenerator()
+        self.id_generator.set_worker_id(0)
+        self.app = create_app(config_mode="testing")
+
+    def test_time_ordered_ids_are_unique_and_increasing(self):
+        ids = [self.id_generator.next_id() for _ in range(5000)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_time_ordered_ids_fit_in_a_javascript_number(self):
+        self.assertLess(self.id_generator.next_id(), 2 ** 53)
+
+    def test_ids_are_unique_across_threads(self):
+        def generate(_):
+            return [self.id_generator.next_id() for _ in range(500)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            ids = [i for batch in executor.map(generate, range(8))
+                   for i in batch]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_workers_generate_distinct_ids(self):
+        other_worker = IdGenerator()
+        self.id_generator.set_worker_id(1)
+        other_worker.set_worker_id(2)
+        self.assertNotEqual(self.id_generator.next_id(),
+                            other_worker.next_id())
+
+    def test_invalid_worker_id(self):
+        self.assertRaises(ValueError, self.id_generator.set_worker_id, 64)
+
+    def worker_id(self, slot=None, **config):
+        id_generator = IdGenerator()
+        self.app.config.update(config)
+        id_generator.init_app(self.app)
+        if slot is not None:
+            id_generator.set_slot(slot)
+        return (id_generator.next_id() >> SEQUENCE_BITS) & MAX_WORKER_ID
+
+    def test_configured_worker_id_takes_precedence_over_the_slot(self):
+        self.assertEqual(self.worker_id(slot=3, WORKER_ID='9'), 9)
+
+    def test_node_id_is_combined_with_the_slot(self):
+        self.assertEqual(self.worker_id(slot=3), 3)
+        self.assertEqual(self.worker_id(slot=3, NODE_ID='2'), 2 << 3 | 3)
+        self.assertNotEqual(self.worker_id(slot=3, NODE_ID='1'),
+                            self.worker_id(slot=3, NODE_ID='2'))
+        self.assertRaises(ValueError, self.worker_id, slot=8, NODE_ID='1')
+
+    def test_several_hosts_need_a_node_id(self):
+        self.app.config.update(MULTI_HOST=True, ID_GENERATOR='time_ordered')
+        self.assertRaises(ValueError, IdGenerator, self.app)
+        self.app.config['NODE_ID'] = '1'
+        IdGenerator(self.app)
+
+    def test_process_without_worker_id_leaves_ids_to_the_database(self):
+        id_generator = IdGenerator(self.app)
+        self.assertIsNone(id_generator.next_id())
+
+
+class TestJSONSerializer(TestCase):
+    def setUp(self):
+        self.app = create_app(config_mode="testing")
+
+    def test_backends_write_the_same_json(self):
+        data = [{'id': 2 ** 53, 'name': 'crème brûlée / 2', 'price': 2.5,
+                 'quantity': 1.0, 'last_item_change': None, 'ok': True}]
+        for name, _ in BACKENDS:
+            self.app.config['JSON_SERIALIZER'] = name
+            serializer = JSONSerializer(self.app)
+            body = serializer.dumps(data)
+            self.assertIsInstance(body, bytes)
+            self.assertEqual(json.loads(body.decode('utf-8')), data)
+            self.assertIn('brûlée / 2', body.decode('utf-8'))
+
+    def test_fastest_backend_by_default(self):
+        self.assertEqual(JSONSerializer(self.app).backend, BACKENDS[0][0])
+
+    def test_unknown_backend(self):
+        self.app.config['JSON_SERIALIZER'] = 'yaml'
+        with self.assertRaises(ValueError):
+            JSONSerializer(self.app)
+
+
+class TestQueryPlans(TestCase):
+    """Checks that the hot list and item queries are served by an index, so
+    that a query change which falls back to a sequential scan is noticed
+    before it reaches tables with millions of rows. The queries are built
+    with the same helpers the routes use"""
+
+    def setUp(self):
+        self.app = create_app(config_mode="testing")
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def query_plan(self, query):
+        dialect = db.engine.dialect
+        compiled = query.statement.compile(dialect=dialect)
+        parameters = compiled.params
+        if compiled.positional:
+            parameters = tuple(parameters[name]
+                               for name in compiled.positiontup)
+        connection = db.session.connection()
+
+        if dialect.name == 'postgresql':
+            # small test tables are always cheapest to scan, so make the
+            # planner show whether an index could be used at all
+            connection.execute('SET LOCAL enable_seqscan = off')
+            rows = connection.execute('EXPLAIN ' + str(compiled),
+                                      parameters).fetchall()
+            plan = ' '.join(row[0] for row in rows)
+            self.assertNotIn('Seq Scan', plan)
+        else:
+            rows = connection.execute('EXPLAIN QUERY PLAN ' + str(compiled),
+                                      parameters).fetchall()
+            details = [row[-1] for row in rows]
+            for detail in details:
+                if detail.startswith('SCAN'):
+                    self.assertIn('INDEX', detail)
+            plan = ' '.join(details)
+
+        db.session.rollback()
+        return plan
+
+    def test_shoppinglists_by_user_use_index(self):
+        plan = self.query_plan(shoppinglists_query(1))
+        self.assertIn('ix_shoppinglists_user_id_', plan)
+
+    def test_shoppinglist_lookup_uses_index(self):
+        self.query_plan(shoppinglist_query(1, 1))
+
+    def test_items_by_shoppinglist_use_index(self):
+        plan = self.query_plan(items_query(1))
+        self.assertIn('ix_shoppinglist_items_list_id_', plan)
+
+    def test_item_lookup_uses_index(self):
+        self.query_plan(item_query(1, 1))
+
+    def test_item_duplicate_lookup_uses_index(self):
+        plan = self.query_plan(existing_items_query(1, {'bread', 'milk'}))
+        # with an empty table the planner may settle for either list index
+        self.assertIn('ix_shoppinglist_items_list_id_', plan)
+
+    def test_modified_since_uses_index(self):
+        filters, _ = get_timestamp_filters(
+            {'modified_since': '2017-10-12T10:40:32Z'})
+        plan = self.query_plan(shoppinglists_query(1, filters))
+        self.assertIn('ix_shoppinglists_user_id_', plan)
+
+    def test_shoppinglist_pages_are_read_in_index_order(self):
+        plan = self.query_plan(page_query(shoppinglists_query(1),
+                                          Shoppinglists.id, 10, 5))
+        self.assertIn('ix_shoppinglists_user_id_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_item_pages_are_read_in_index_order(self):
+        plan = self.query_plan(page_query(items_query(1),
+                                          ShoppingListItems.id, 10, 5))
+        self.assertIn('ix_shoppinglist_items_list_id_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotIn('Sort', plan)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        self.app = create_app(config_mode="testing")
+        self.app.config.update(SQLALCHEMY_POOL_SIZE=1,
+                               SQLALCHEMY_MAX_OVERFLOW=0,
+                               SQLALCHEMY_POOL_TIMEOUT=0.1,
+                               SQLALCHEMY_POOL_PRE_PING=True,
+                               SQLALCHEMY_STATEMENT_TIMEOUT=1000,
+                               PUBLISH_POOL_STATS=True)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def test_pool_settings_are_applied(self):
+        self.assertIsInstance(db.engine.pool, MonitoredQueuePool)
+        self.assertEqual(db.engine.pool.size(), 1)
+
+    def test_pool_stats_are_published(self):
+        db.session.execute('SELECT 1')
+        db.session.remove()
+
+        r = self.app.test_client().get('/status/pool')
+        self.assertEqual(r.status_code, 200)
+        stats = json.loads(r.data)
+        self.assertGreaterEqual(stats['checkouts'], 1)
+        self.assertEqual(stats['max_checked_out'], 1)
+        self.assertEqual(stats['pool_size'], 1)
+
+    def test_pool_stats_are_hidden_by_default(self):
+        self.app.config['PUBLISH_POOL_STATS'] = False
+        r = self.app.test_client().get('/status/pool')
+        self.assertEqual(r.status_code, 404)
+
+    def test_pool_checkout_timeouts_are_counted(self):
+        connection = db.engine.connect()
+        self.assertRaises(exc.TimeoutError, db.engine.connect)
+        connection.close()
+        self.assertEqual(db.engine.pool.stats()['timeouts'], 1)
+
+    def test_dead_connections_are_replaced(self):
+        connection = db.engine.raw_connection()
+        dbapi_connection = connection.connection
+        connection.close()
+        # the server drops the idle connection
+        dbapi_connection.close()
+
+        self.assertEqual(db.session.execute('SELECT 1').scalar(), 1)
+
+    def test_connections_from_another_process_are_discarded(self):
+        connection = db.engine.raw_connection()
+        dbapi_connection = connection.connection
+        connection._connection_record.info['pid'] = -1
+        connection.close()
+
+        connection = db.engine.raw_connection()
+        self.assertIsNot(connection.connection, dbapi_connection)
+        connection.close()
+
+    def test_statement_timeout(self):
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('statement timeouts are set on PostgreSQL only')
+        self.assertEqual(
+            db.session.execute('SHOW statement_timeout').scalar(), '1s')
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+
+
+class TestReadReplicas(TestCase):
+    """Uses a second SQLite database, which nothing replicates to, as the
+    replica so that it is visible which database served a read"""
+
+    def setUp(self):
+        handle, self.replica_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.app = create_app(config_mode="testing")
+        self.app.config.update(
+            SQLALCHEMY_BINDS={'replica': 'sqlite:///' + self.replica_path},
+            REPLICA_BINDS=['replica'])
+        app.token_cache.clear()
+
+        with self.app.app_context():
+            db.create_all()
+            # the replica has the same schema but none of the data
+            db.Model.metadata.create_all(
+                bind=db.get_engine(self.app, bind='replica'))
+        self.client = self.app.test_client()
+
+        user = {'username': 'replicated', 'password': 'test_password',
+                'answer': 'yes', 'security_question': 'Am I myself?'}
+        self.client.post('/user/register/', data=user)
+        r = self.client.post('/user/login/', data=user)
+        self.headers = {
+            'Authorization': 'Bearer ' + json.loads(r.data)['token']}
+
+    def get_titles(self):
+        r = self.client.get('/shoppinglist/', headers=self.headers)
+        self.assertEqual(r.status_code, 200)
+        return [shopping_list['title'] for shopping_list in
+                json.loads(r.data)]
+
+    def test_reads_go_to_replica(self):
+        self.app.config['REPLICA_PIN_SECONDS'] = 0
+        self.client.post('/shoppinglist/', data={'title': 'on primary'},
+                         headers=self.headers)
+        self.assertEqual(self.get_titles(), [])
+
+        with self.app.app_context():
+            user = User.query.filter_by(username='replicated').first()
+            replica = db.get_engine(self.app, bind='replica')
+            replica.execute(User.__table__.insert(), id=user.id,
+                            username=user.username, firstname='',
+                            lastname='', password_hash='-')
+            replica.execute(
+                Shoppinglists.__table__.insert(),
+                id=1, title='on replica', user_id=user.id,
+                created_on=datetime.datetime.utcnow(),
+                modified_on=datetime.datetime.utcnow())
+        self.assertEqual(self.get_titles(), ['on replica'])
+
+    def test_writers_read_their_own_writes(self):
+        self.app.config['REPLICA_PIN_SECONDS'] = 60
+        self.client.post('/shoppinglist/', data={'title': 'on primary'},
+                         headers=self.headers)
+        self.assertEqual(self.get_titles(), ['on primary'])
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.get_engine(self.app, bind='replica').dispose()
+        os.remove(self.replica_path)
+
+
 class TestAPI(TestCase):
     def setUp(self):
         self.username = 'user20nm'
@@ -75,6 +438,9 @@ class TestAPI(TestCase):
             'security_question': security_question
         }
         self.app = create_app(config_mode="testing")
+        app.token_cache.clear()
+        app.unknown_usernames.clear()
+        app.id_generator.set_slot(0)  # as gunicorn's post_fork hook does
 
         with self.app.app_context():  # bind the app to the current context
             db.create_all()  # create all tables
@@ -129,11 +495,8 @@ class TestAPI(TestCase):
 
     @staticmethod
     def get_current_timestamp():
-        # get current timestamp
-        epoch_time = time.time()
-        timestamp = datetime.datetime.fromtimestamp(epoch_time).strftime(
-            '%Y-%m-%d %H:%M')
-        return timestamp
+        # get current timestamp, as formatted in responses
+        return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
 
     def create_item_resource(self, shoppinglist_id=None):
         headers = self.get_authorization_header()
@@ -159,6 +522,21 @@ class TestAPI(TestCase):
 
         return item_id
 
+    @contextmanager
+    def count_queries(self):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
     # END HELPER FUNCTIONS
 
     def test_api_index_page(self):
@@ -345,6 +723,28 @@ class TestAPI(TestCase):
         self.assertEqual(user_logout.status_code, 200)
         self.assertIn('User logged out', str(user_logout.data))
 
+    def test_api_logout_revokes_token(self):
+        headers = self.get_authorization_header()
+        self.assertEqual(
+            self.client().get('/shoppinglist/', headers=headers).status_code,
+            200)
+
+        self.client().get('/user/logout/', headers=headers)
+
+        self.assertEqual(
+            self.client().get('/shoppinglist/', headers=headers).status_code,
+            401)
+
+    def test_revoked_token_is_seen_by_other_workers(self):
+        token = self.get_authorization_token()
+        other_worker = RevocationStore(self.app)
+
+        self.client().get('/user/logout/',
+                          headers={'Authorization': 'Bearer ' + token})
+
+        jti = app.serializer.loads(token)['jti']
+        self.assertTrue(other_worker.is_revoked(jti))
+
     def test_invalid_verify_auth_token(self):
         token = app.verify_auth_token("gdfchvjkbl")
         self.assertEqual(None, token)
@@ -354,6 +754,128 @@ class TestAPI(TestCase):
             user = app.verify_auth_token(self.get_authorization_token())
             self.assertEqual(user.username, self.username)
 
+    def test_token_cache_avoids_repeated_user_lookups(self):
+        headers = self.get_authorization_header()
+        self.client().get('/shoppinglist/', headers=headers)
+        self.client().get('/shoppinglist/', headers=headers)
+
+        stats = app.token_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_change_password_invalidates_cached_token(self):
+        headers = self.get_authorization_header()
+        self.client().get('/shoppinglist/', headers=headers)
+        self.client().put('/user/change_password/',
+                          data={'password': 'new_password'}, headers=headers)
+
+        self.assertEqual(app.token_cache.stats()['size'], 0)
+
+    def test_concurrent_requests_do_not_leak_identity(self):
+        usernames = ['parallel_user{}'.format(i) for i in range(4)]
+        headers = {}
+        for username in usernames:
+            credentials = dict(self.test_user, username=username)
+            self.client().post('/user/register/', data=credentials)
+            r = self.client().post('/user/login/', data=credentials)
+            headers[username] = {
+                'Authorization': 'Bearer ' + json.loads(r.data)['token']
+            }
+
+        def create_and_list(task):
+            username = usernames[task % len(usernames)]
+            client = self.app.test_client()
+            client.post('/shoppinglist/',
+                        data={'title': '{} list {}'.format(username, task)},
+                        headers=headers[username])
+            r = client.get('/shoppinglist/', headers=headers[username])
+            return username, json.loads(r.data)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(create_and_list, range(40)))
+
+        for username, shopping_lists in results:
+            self.assertTrue(shopping_lists)
+            for shopping_list in shopping_lists:
+                self.assertTrue(
+                    shopping_list['title'].startswith(username + ' '))
+
+    def test_passwords_are_stored_as_bcrypt_hashes(self):
+        self.get_authorization_header()
+        with self.app.app_context():
+            user = User.query.filter_by(username=self.username).first()
+            self.assertTrue(user.password_hash.startswith('$2'))
+            self.assertFalse(password_hasher.needs_rehash(user.password_hash))
+
+    def test_legacy_password_hash_is_upgraded_on_login(self):
+        with self.app.app_context():
+            User(username=self.username,
+                 password_hash=sha1_hash(self.test_user['password']),
+                 answer='yes', security_question='Am I myself?').save()
+
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 200)
+
+        with self.app.app_context():
+            user = User.query.filter_by(username=self.username).first()
+            self.assertTrue(user.password_hash.startswith('$2'))
+
+        # the upgraded hash still accepts the same password
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 200)
+
+    def test_login_normalises_username(self):
+        self.client().post('/user/register/', data=self.test_user)
+        credentials = dict(self.test_user,
+                           username='  ' + self.username.upper())
+
+        r = self.client().post('/user/login/', data=credentials)
+        self.assertEqual(r.status_code, 200)
+
+    def test_repeated_login_for_unknown_user_skips_database(self):
+        credentials = dict(self.test_user, username='no_such_user')
+        self.client().post('/user/login/', data=credentials)
+
+        with self.count_queries() as statements:
+            r = self.client().post('/user/login/', data=credentials)
+
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(statements, [])
+
+    def test_registering_clears_unknown_username(self):
+        self.client().post('/user/login/', data=self.test_user)
+        self.client().post('/user/register/', data=self.test_user)
+
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 200)
+
+    def test_registration_through_another_worker_is_seen(self):
+        username = self.test_user['username']
+        self.client().post('/user/register/', data=self.test_user)
+        # another worker cached the username as unknown before it was
+        # registered, and was not the one to register it
+        app.unknown_usernames.set(username, True)
+
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 200)
+        self.assertIsNone(app.unknown_usernames.get(username))
+
+    def test_registration_on_another_host_is_seen(self):
+        self.app.config['MULTI_HOST'] = True
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 401)
+        self.assertIsNone(app.unknown_usernames.get(self.username))
+
+        # registered on another host, whose registration log is not this one
+        with self.app.app_context():
+            User(username=self.username,
+                 password_hash=password_hasher.hash_password(
+                     self.test_user['password']),
+                 answer='yes', security_question='Am I myself?').save()
+
+        r = self.client().post('/user/login/', data=self.test_user)
+        self.assertEqual(r.status_code, 200)
+
     def test_api_create_duplicate_username(self):
         # create a user
         self.get_authorization_header()
@@ -492,6 +1014,28 @@ class TestAPI(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("successfully", str(response.data))
 
+    def test_delete_shoppinglist_with_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        item_id = self.get_item_id(shoppinglist_id)
+        self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': i} for i in range(50)],
+            headers)
+
+        with self.count_queries() as statements:
+            response = self.client().delete(
+                '/shoppinglist/{}'.format(shoppinglist_id), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        # the list lookup and a single DELETE; the database removes the items
+        self.assertEqual(len(statements), 2)
+        self.assertTrue(statements[1].startswith('DELETE FROM shoppinglists'))
+
+        with self.app.app_context():
+            self.assertEqual(ShoppingListItems.query.filter_by(
+                shoppinglist_id=shoppinglist_id).count(), 0)
+        r = self.client().get('/items/{}'.format(item_id), headers=headers)
+        self.assertEqual(r.status_code, 404)
+
     def test_access_non_existent_shoppinglist(self):
         get_shoppinglist_resource = self.client().get(
             '/shoppinglist/123456789',
@@ -515,6 +1059,45 @@ class TestAPI(TestCase):
         self.assertEqual(create_shoppinglist_resource.status_code, 409)
         self.assertIn('already exists', str(create_shoppinglist_resource.data))
 
+    def test_duplicate_titles_are_rejected_by_the_database(self):
+        headers = self.get_authorization_header()
+        self.client().post('/shoppinglist/', data={'title': 'groceries'},
+                           headers=headers)
+
+        with self.count_queries() as statements:
+            r = self.client().post('/shoppinglist/',
+                                   data={'title': 'groceries'},
+                                   headers=headers)
+        self.assertEqual(r.status_code, 409)
+        self.assertFalse([statement for statement in statements
+                          if statement.startswith('SELECT')])
+
+    def test_concurrent_duplicate_shoppinglists(self):
+        headers = self.get_authorization_header()
+
+        def create_shoppinglist(_):
+            return self.client().post('/shoppinglist/',
+                                      data={'title': 'party'},
+                                      headers=headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(create_shoppinglist, range(8)))
+        self.assertEqual(sorted(statuses), [201] + [409] * 7)
+
+    def test_concurrent_duplicate_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+
+        def create_item(_):
+            return self.client().post(
+                '/shoppinglist/{}/items/'.format(shoppinglist_id),
+                data={'name': 'bread', 'price': 1},
+                headers=headers).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            statuses = list(executor.map(create_item, range(8)))
+        self.assertEqual(sorted(statuses), [201] + [409] * 7)
+
     def test_search_for_non_existent_shoppinglists(self):
         # search shoppinglist
         search_shoppinglist_resource = self.client().get(
@@ -542,6 +1125,53 @@ class TestAPI(TestCase):
         self.assertIn('back to school',
                       str(search_shoppinglist_resource.data))
 
+    def test_search_treats_wildcards_literally(self):
+        headers = self.get_authorization_header()
+        self.create_shoppinglist_resource()
+
+        for keyword in ('%', '_', 'back%school'):
+            search_shoppinglist_resource = self.client().get(
+                '/shoppinglist/?q={}'.format(keyword.replace('%', '%25')),
+                headers=headers
+            )
+            self.assertEqual(search_shoppinglist_resource.status_code, 404)
+
+    def test_search_short_keyword(self):
+        headers = self.get_authorization_header()
+        self.create_shoppinglist_resource()
+
+        search_shoppinglist_resource = self.client().get(
+            '/shoppinglist/?q=ba', headers=headers
+        )
+        self.assertEqual(search_shoppinglist_resource.status_code, 200)
+        self.assertIn('back to school',
+                      str(search_shoppinglist_resource.data))
+
+    def test_search_finds_renamed_shoppinglist(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.client().put('/shoppinglist/{}'.format(shoppinglist_id),
+                          data={'title': 'weekend party'}, headers=headers)
+
+        old_title = self.client().get('/shoppinglist/?q=school',
+                                      headers=headers)
+        new_title = self.client().get('/shoppinglist/?q=party',
+                                      headers=headers)
+        self.assertEqual(old_title.status_code, 404)
+        self.assertEqual(new_title.status_code, 200)
+
+    def test_search_ranks_closest_match_first(self):
+        headers = self.get_authorization_header()
+        for title in ('weekly groceries with milk for the kids', 'milk'):
+            self.client().post('/shoppinglist/', data={'title': title},
+                               headers=headers)
+
+        r = self.client().get('/shoppinglist/?q=milk', headers=headers)
+        titles = [shopping_list['title'] for shopping_list in
+                  json.loads(r.data)]
+        self.assertEqual(titles, ['milk',
+                                  'weekly groceries with milk for the kids'])
+
     def test_shoppinglists_pagination(self):
         headers = self.get_authorization_header()
 
@@ -567,6 +1197,639 @@ class TestAPI(TestCase):
         self.assertEqual(get_paginated_shoppinglist_resource.status_code, 200)
         self.assertEqual(len(json_data), 100)
 
+    def test_shoppinglists_cursor_pagination(self):
+        headers = self.get_authorization_header()
+        for i in range(5):
+            self.client().post('/shoppinglist/',
+                               data={'title': 'list {}'.format(i)},
+                               headers=headers)
+
+        titles = []
+        url = '/shoppinglist/?limit=2'
+        while url:
+            r = self.client().get(url, headers=headers)
+            self.assertEqual(r.status_code, 200)
+            page = json.loads(r.data)
+            self.assertLessEqual(len(page), 2)
+            titles.extend(shopping_list['title'] for shopping_list in page)
+
+            url = None
+            if 'Link' in r.headers:
+                self.assertIn('rel="next"', r.headers['Link'])
+                url = '/shoppinglist/?limit=2&cursor={}'.format(
+                    r.headers['X-Next-Cursor'])
+
+        self.assertEqual(sorted(titles),
+                         ['list {}'.format(i) for i in range(5)])
+
+    def test_items_cursor_pagination(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        for name in ('bread', 'milk', 'eggs'):
+            self.client().post(
+                '/shoppinglist/{}/items/'.format(shoppinglist_id),
+                data={'name': name, 'price': 10}, headers=headers)
+
+        first_page = self.client().get(
+            '/shoppinglist/{}/items/?limit=2'.format(shoppinglist_id),
+            headers=headers)
+        second_page = self.client().get(
+            '/shoppinglist/{}/items/?limit=2&cursor={}'.format(
+                shoppinglist_id, first_page.headers['X-Next-Cursor']),
+            headers=headers)
+
+        self.assertEqual(len(json.loads(first_page.data)), 2)
+        self.assertEqual(len(json.loads(second_page.data)), 1)
+        self.assertNotIn('Link', second_page.headers)
+
+    def test_shoppinglists_modified_since(self):
+        headers = self.get_authorization_header()
+        old_id = self.get_shoppinglist_id()
+        r = self.client().get('/shoppinglist/{}'.format(old_id),
+                              headers=headers)
+        since = json.loads(r.data)['modified_on']
+
+        self.client().post('/shoppinglist/', data={'title': 'new list'},
+                           headers=headers)
+        r = self.client().get('/shoppinglist/',
+                              query_string={'modified_since': since},
+                              headers=headers)
+        self.assertEqual([shopping_list['title'] for shopping_list in
+                          json.loads(r.data)], ['new list'])
+
+        # updating the old list makes it show up again
+        self.client().put('/shoppinglist/{}'.format(old_id),
+                          data={'title': 'renamed list'}, headers=headers)
+        r = self.client().get('/shoppinglist/',
+                              query_string={'modified_since': since},
+                              headers=headers)
+        self.assertEqual(sorted(shopping_list['title'] for shopping_list in
+                                json.loads(r.data)),
+                         ['new list', 'renamed list'])
+
+    def test_shoppinglists_created_before(self):
+        headers = self.get_authorization_header()
+        self.create_shoppinglist_resource()
+        r = self.client().get('/shoppinglist/',
+                              query_string={'created_before': '2017-01-01'},
+                              headers=headers)
+        self.assertEqual(json.loads(r.data), [])
+
+        r = self.client().get(
+            '/shoppinglist/',
+            query_string={'created_before': '2999-01-01T00:00:00+03:00'},
+            headers=headers)
+        self.assertEqual(len(json.loads(r.data)), 1)
+
+    def test_shoppinglists_invalid_timestamp_filter(self):
+        headers = self.get_authorization_header()
+        for name in ('modified_since', 'created_before'):
+            r = self.client().get('/shoppinglist/',
+                                  query_string={name: 'yesterday'},
+                                  headers=headers)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn(name, str(r.data))
+
+    def test_shoppinglists_include_totals(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1.5, 'quantity': 2},
+            {'name': 'milk', 'price': 2}], headers)
+        self.client().post('/shoppinglist/', data={'title': 'empty list'},
+                           headers=headers)
+
+        with self.count_queries() as statements:
+            r = self.client().get('/shoppinglist/?include=totals',
+                                  headers=headers)
+        # the totals are kept on the lists
+        self.assertEqual(len(statements), 1)
+        totals = {shopping_list['title']: (shopping_list['item_count'],
+                                           shopping_list['total'])
+                  for shopping_list in json.loads(r.data)}
+        self.assertEqual(totals, {'back to school': (2, 5),
+                                  'empty list': (0, 0)})
+
+        r = self.client().get(
+            '/shoppinglist/{}?include=totals'.format(shoppinglist_id),
+            headers=headers)
+        self.assertEqual(json.loads(r.data)['item_count'], 2)
+        self.assertEqual(json.loads(r.data)['total'], 5)
+
+        # totals are only computed when asked for
+        r = self.client().get('/shoppinglist/', headers=headers)
+        self.assertNotIn('total', json.loads(r.data)[0])
+
+    def get_list_totals(self, shoppinglist_id, headers):
+        r = self.client().get(
+            '/shoppinglist/{}?include=totals'.format(shoppinglist_id),
+            headers=headers)
+        data = json.loads(r.data)
+        return data['item_count'], data['total']
+
+    def test_list_totals_follow_item_changes(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        item_id = self.get_item_id(shoppinglist_id)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (1, 100))
+
+        self.client().put('/items/{}'.format(item_id),
+                          data={'name': 'boots', 'price': 200,
+                                'quantity': 2}, headers=headers)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (1, 400))
+
+        # a rejected duplicate leaves the totals alone
+        self.client().post('/shoppinglist/{}/items/'.format(shoppinglist_id),
+                           data={'name': 'boots', 'price': 200,
+                                 'quantity': 2}, headers=headers)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (1, 400))
+
+        results = json.loads(self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1}, {'name': 'milk', 'price': 2},
+            {'name': 'eggs', 'price': 3}], headers).data)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (4, 406))
+
+        self.send_items_request('PATCH', shoppinglist_id, {
+            'ids': [results[0]['id'], results[1]['id']],
+            'changes': {'quantity': 4}}, headers)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (4, 415))
+
+        self.send_items_request('DELETE', shoppinglist_id, {
+            'ids': [results[2]['id']]}, headers)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (3, 412))
+
+        r = self.client().delete('/items/{}'.format(item_id),
+                                 headers=headers)
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (2, 12))
+
+        r = self.client().get(
+            '/shoppinglist/{}?include=totals'.format(shoppinglist_id),
+            headers=headers)
+        self.assertIn(self.get_current_timestamp(),
+                      json.loads(r.data)['last_item_change'])
+
+    def test_recompute_list_totals_repairs_drift(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1}, {'name': 'milk', 'price': 2}],
+            headers)
+        self.client().post('/shoppinglist/', data={'title': 'empty list'},
+                           headers=headers)
+
+        with self.app.app_context():
+            Shoppinglists.query.update({'item_count': 7, 'total_cost': 99})
+            self.assertEqual(recompute_list_totals(Shoppinglists.query), 2)
+            db.session.commit()
+        self.assertEqual(self.get_list_totals(shoppinglist_id, headers),
+                         (2, 3))
+
+    def test_shoppinglists_include_items(self):
+        headers = self.get_authorization_header()
+        list_ids = []
+        for title in ('first', 'second', 'third'):
+            r = self.client().post('/shoppinglist/', data={'title': title},
+                                   headers=headers)
+            list_ids.append(json.loads(r.data)['id'])
+            self.post_items(list_ids[-1], [
+                {'name': '{} {}'.format(title, i), 'price': i}
+                for i in range(1, 4)], headers)
+
+        with self.count_queries() as statements:
+            r = self.client().get('/shoppinglist/?include=items&limit=2',
+                                  headers=headers)
+        # the page of lists and a single query for the items of all of them
+        self.assertEqual(len(statements), 2)
+        self.assertIn(' IN ', statements[1])
+
+        shopping_lists = json.loads(r.data)
+        self.assertEqual([shopping_list['id']
+                          for shopping_list in shopping_lists], list_ids[:2])
+        self.assertEqual([item['name'] for item in shopping_lists[1]['items']],
+                         ['second 1', 'second 2', 'second 3'])
+
+        # the next page brings the items of its own lists
+        r = self.client().get(
+            '/shoppinglist/?include=items,totals&cursor={}'.format(
+                r.headers['X-Next-Cursor']), headers=headers)
+        shopping_list, = json.loads(r.data)
+        self.assertEqual(len(shopping_list['items']), 3)
+        self.assertEqual(shopping_list['item_count'], 3)
+
+        r = self.client().get(
+            '/shoppinglist/{}?include=items'.format(list_ids[0]),
+            headers=headers)
+        self.assertEqual(json.loads(r.data)['items'][0],
+                         {'id': json.loads(r.data)['items'][0]['id'],
+                          'name': 'first 1', 'price': 1, 'quantity': 1})
+
+        r = self.client().get('/shoppinglist/', headers=headers)
+        self.assertNotIn('items', json.loads(r.data)[0])
+
+    def test_shoppinglists_include_unknown_detail(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        for url in ('/shoppinglist/', '/shoppinglist/{}'.format(
+                shoppinglist_id)):
+            r = self.client().get(url + '?include=totals,owner',
+                                  headers=headers)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn('owner', str(r.data))
+
+    def test_shoppinglists_fields(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        # authenticate once, so that the user is cached
+        self.client().get('/shoppinglist/', headers=headers)
+
+        with self.count_queries() as statements:
+            r = self.client().get('/shoppinglist/?fields=title,id',
+                                  headers=headers)
+        self.assertEqual(json.loads(r.data),
+                         [{'id': shoppinglist_id, 'title': 'back to school'}])
+        # only the columns needed are selected
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('created_on', statements[0])
+        self.assertIn('ETag', r.headers)
+
+        r = self.client().get('/shoppinglist/?fields=title&include=totals',
+                              headers=headers)
+        self.assertEqual(json.loads(r.data), [{
+            'title': 'back to school', 'item_count': 0, 'total': 0,
+            'last_item_change': None}])
+
+        r = self.client().get('/shoppinglist/?fields=title&stream=true',
+                              headers=headers)
+        self.assertEqual(json.loads(r.data), [{'title': 'back to school'}])
+
+        with self.count_queries() as statements:
+            r = self.client().get(
+                '/shoppinglist/{}?fields=modified_on'.format(shoppinglist_id),
+                headers=headers)
+        self.assertEqual(list(json.loads(r.data)), ['modified_on'])
+        self.assertNotIn('title', statements[0])
+        self.assertIn('Last-Modified', r.headers)
+
+    def test_items_fields(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': i} for i in range(1, 4)],
+            headers)
+        url = '/shoppinglist/{}/items/'.format(shoppinglist_id)
+
+        with self.count_queries() as statements:
+            r = self.client().get(url + '?fields=name', headers=headers)
+        self.assertEqual(json.loads(r.data), [
+            {'name': 'item 1'}, {'name': 'item 2'}, {'name': 'item 3'}])
+        self.assertNotIn('price', statements[-1])
+
+        r = self.client().get(url + '?fields=name,price&limit=2',
+                              headers=headers)
+        self.assertEqual(json.loads(r.data), [
+            {'name': 'item 1', 'price': 1}, {'name': 'item 2', 'price': 2}])
+        r = self.client().get(url + '?fields=name,price&cursor={}'.format(
+            r.headers['X-Next-Cursor']), headers=headers)
+        self.assertEqual(json.loads(r.data), [{'name': 'item 3', 'price': 3}])
+
+        r = self.client().get(url + '?fields=price&q=item 2',
+                              headers=headers)
+        self.assertEqual(json.loads(r.data), [{'price': 2}])
+
+        r = self.client().get(url + '?fields=id&stream=true', headers=headers)
+        item_id = json.loads(r.data)[0]['id']
+        self.assertEqual(list(json.loads(r.data)[0]), ['id'])
+
+        with self.count_queries() as statements:
+            r = self.client().get('/items/{}?fields=quantity'.format(item_id),
+                                  headers=headers)
+        self.assertEqual(json.loads(r.data), {'quantity': 1})
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('price', statements[0])
+        self.assertIn('ETag', r.headers)
+
+    def test_unknown_fields_are_rejected(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        # authenticate once, so that the user is cached
+        self.client().get('/shoppinglist/', headers=headers)
+        for url in ('/shoppinglist/?fields=id,user_id',
+                    '/shoppinglist/{}?fields=name'.format(shoppinglist_id),
+                    '/shoppinglist/{}/items/?fields=shoppinglist_id'.format(
+                        shoppinglist_id),
+                    '/items/1?fields=title'):
+            with self.count_queries() as statements:
+                r = self.client().get(url, headers=headers)
+            self.assertEqual(r.status_code, 400)
+            self.assertIn('Cannot select field', str(r.data))
+            self.assertEqual(statements, [])
+
+    def test_stream_shoppinglists(self):
+        headers = self.get_authorization_header()
+        for title in ('first', 'second', 'third', 'fourth', 'fifth'):
+            r = self.client().post('/shoppinglist/', data={'title': title},
+                                   headers=headers)
+            self.post_items(json.loads(r.data)['id'], [
+                {'name': '{} {}'.format(title, i), 'price': i}
+                for i in range(1, 3)], headers)
+
+        self.app.config.update(STREAM_CHUNK_SIZE=2, STREAM_MIN_ROWS=0)
+        with self.count_queries() as statements:
+            r = self.client().get(
+                '/shoppinglist/?include=items,totals&stream=true',
+                headers=headers)
+            self.assertTrue(r.is_streamed)
+            streamed = json.loads(r.data)
+        # the lists and one query for the items of each chunk of 2 lists
+        self.assertEqual(len(statements), 4)
+
+        r = self.client().get('/shoppinglist/?include=items,totals',
+                              headers=headers)
+        self.assertEqual(streamed, json.loads(r.data))
+        self.assertEqual(len(streamed), 5)
+
+        r = self.client().get('/shoppinglist/?stream=1&modified_since='
+                              '2999-01-01T00:00:00Z', headers=headers)
+        self.assertEqual(json.loads(r.data), [])
+
+    def test_stream_shoppinglist_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': i} for i in range(25)],
+            headers)
+        url = '/shoppinglist/{}/items/'.format(shoppinglist_id)
+
+        self.app.config.update(STREAM_CHUNK_SIZE=10, STREAM_MIN_ROWS=20)
+        r = self.client().get(url + '?stream=true', headers=headers)
+        self.assertTrue(r.is_streamed)
+        self.assertNotIn('Content-Length', r.headers)
+        self.assertEqual(json.loads(r.data),
+                         json.loads(self.client().get(url,
+                                                      headers=headers).data))
+
+        # fewer items than are worth streaming are sent in one piece
+        self.app.config['STREAM_MIN_ROWS'] = 30
+        buffered = self.client().get(url + '?stream=true', headers=headers)
+        self.assertIn('Content-Length', buffered.headers)
+        self.assertEqual(buffered.data, r.data)
+        # the items change with the list, so streams revalidate too
+        r = self.client().get(url + '?stream=true', headers=dict(
+            headers, **{'If-None-Match': r.headers['ETag']}))
+        self.assertEqual(r.status_code, 304)
+
+        for query_string in ('stream=true&limit=5', 'stream=1&q=item',
+                             'stream=true&cursor=eyJhZnRlciI6IDF9'):
+            r = self.client().get(url + '?' + query_string, headers=headers)
+            self.assertEqual(r.status_code, 400)
+            r = self.client().get('/shoppinglist/?' + query_string,
+                                  headers=headers)
+            self.assertEqual(r.status_code, 400)
+
+    def test_conditional_get_of_shoppinglist(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        url = '/shoppinglist/{}'.format(shoppinglist_id)
+        r = self.client().get(url, headers=headers)
+        etag = r.headers['ETag']
+        self.assertIn('Last-Modified', r.headers)
+
+        with self.count_queries() as statements:
+            r = self.client().get(url, headers=dict(headers,
+                                                    **{'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.data, b'')
+        self.assertEqual(r.headers['ETag'], etag)
+        self.assertEqual(len(statements), 1)
+
+        # changes to the list's items make a new version of the list
+        self.get_item_id(shoppinglist_id)
+        r = self.client().get(url, headers=dict(headers,
+                                                **{'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r.headers['ETag'], etag)
+
+        items_url = url + '/items/'
+        etag = self.client().get(items_url, headers=headers).headers['ETag']
+        r = self.client().get(items_url, headers=dict(
+            headers, **{'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 304)
+
+    def test_conditional_get_of_shoppinglists(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        r = self.client().get('/shoppinglist/', headers=headers)
+        etag = r.headers['ETag']
+
+        with self.count_queries() as statements:
+            r = self.client().get('/shoppinglist/', headers=dict(
+                headers, **{'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 304)
+        # only the IDs and versions of the page are read
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('title', statements[0])
+
+        for change in (
+                lambda: self.get_item_id(shoppinglist_id),
+                lambda: self.client().post('/shoppinglist/',
+                                           data={'title': 'another list'},
+                                           headers=headers),
+                lambda: self.client().delete(
+                    '/shoppinglist/{}'.format(shoppinglist_id),
+                    headers=headers)):
+            change()
+            r = self.client().get('/shoppinglist/', headers=dict(
+                headers, **{'If-None-Match': etag}))
+            self.assertEqual(r.status_code, 200)
+            self.assertNotEqual(r.headers['ETag'], etag)
+            etag = r.headers['ETag']
+
+    def test_conditional_get_of_a_page_followed_by_a_new_list(self):
+        headers = self.get_authorization_header()
+        for title in ('first', 'second'):
+            self.client().post('/shoppinglist/', data={'title': title},
+                               headers=headers)
+        url = '/shoppinglist/?limit=2'
+        r = self.client().get(url, headers=headers)
+        self.assertNotIn('Link', r.headers)
+        etag = r.headers['ETag']
+
+        # the page is unchanged, but now has a next page
+        self.client().post('/shoppinglist/', data={'title': 'third'},
+                           headers=headers)
+        r = self.client().get(url, headers=dict(
+            headers, **{'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r.headers['ETag'], etag)
+        self.assertIn('rel="next"', r.headers['Link'])
+
+        r = self.client().get(url, headers=dict(
+            headers, **{'If-None-Match': r.headers['ETag']}))
+        self.assertEqual(r.status_code, 304)
+
+    def test_conditional_writes(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        url = '/shoppinglist/{}'.format(shoppinglist_id)
+        etag = self.client().get(url, headers=headers).headers['ETag']
+
+        r = self.client().put(url, data={'title': 'first'},
+                              headers=dict(headers, **{'If-Match': etag}))
+        self.assertEqual(r.status_code, 200)
+        new_etag = r.headers['ETag']
+
+        # a write based on the old version is refused
+        for method in ('put', 'delete'):
+            r = getattr(self.client(), method)(
+                url, data={'title': 'second'},
+                headers=dict(headers, **{'If-Match': etag}))
+            self.assertEqual(r.status_code, 412)
+        r = self.client().get(url, headers=headers)
+        self.assertEqual(json.loads(r.data)['title'], 'first')
+
+        item_id = self.get_item_id(shoppinglist_id)
+        r = self.client().put('/items/{}'.format(item_id),
+                              data={'name': 'socks', 'price': 5},
+                              headers=dict(headers, **{'If-Match': new_etag}))
+        self.assertEqual(r.status_code, 412)
+
+        etag = self.client().get('/items/{}'.format(item_id),
+                                 headers=headers).headers['ETag']
+        r = self.client().delete('/items/{}'.format(item_id),
+                                 headers=dict(headers, **{'If-Match': etag}))
+        self.assertEqual(r.status_code, 200)
+
+    def test_large_responses_are_compressed(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': i} for i in range(100)],
+            headers)
+        url = '/shoppinglist/{}/items/'.format(shoppinglist_id)
+        plain = self.client().get(url, headers=headers)
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+        for encoding, wbits in (('gzip', 16 + zlib.MAX_WBITS),
+                                ('deflate', zlib.MAX_WBITS)):
+            r = self.client().get(url, headers=dict(
+                headers, **{'Accept-Encoding': encoding}))
+            self.assertEqual(r.headers['Content-Encoding'], encoding)
+            self.assertIn('Accept-Encoding', r.headers['Vary'])
+            self.assertLess(len(r.data), len(plain.data) / 4)
+            self.assertEqual(zlib.decompress(r.data, wbits), plain.data)
+
+        # the client's preference wins
+        r = self.client().get(url, headers=dict(
+            headers, **{'Accept-Encoding': 'gzip;q=0.5, deflate'}))
+        self.assertEqual(r.headers['Content-Encoding'], 'deflate')
+
+        # the ETag of a compressed response revalidates too
+        etag = r.headers['ETag']
+        self.assertNotEqual(etag, plain.headers['ETag'])
+        r = self.client().get(url, headers=dict(
+            headers, **{'Accept-Encoding': 'deflate',
+                        'If-None-Match': etag}))
+        self.assertEqual(r.status_code, 304)
+        # with the ETag and Vary header of the compressed response
+        self.assertEqual(r.headers['ETag'], etag)
+        self.assertIn('Accept-Encoding', r.headers['Vary'])
+
+        gzip_etag = self.client().get(url, headers=dict(
+            headers, **{'Accept-Encoding': 'gzip'})).headers['ETag']
+        r = self.client().get(url, headers=dict(
+            headers, **{'Accept-Encoding': 'gzip',
+                        'If-None-Match': gzip_etag}))
+        self.assertEqual(r.status_code, 304)
+        self.assertTrue(r.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(r.headers['ETag'], gzip_etag)
+        self.assertIn('Accept-Encoding', r.headers['Vary'])
+
+    def test_small_responses_are_not_compressed(self):
+        r = self.client().get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', r.headers)
+
+        self.app.config['COMPRESS_MIN_SIZE'] = 10
+        r = self.client().get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+
+    def test_precompressed_payloads(self):
+        renders = []
+
+        @self.app.route('/spec.json')
+        def spec():
+            renders.append(1)
+            return json.dumps({'paths': ['/items/'] * 500})
+
+        compressor.precompress(self.app, '/spec.json')
+        for _ in range(3):
+            r = self.client().get('/spec.json',
+                                  headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(zlib.decompress(r.data, 16 + zlib.MAX_WBITS)),
+            {'paths': ['/items/'] * 500})
+        self.assertEqual(len(renders), 1)
+
+        r = self.client().get('/spec.json')
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertEqual(len(json.loads(r.data)['paths']), 500)
+
+    def test_streamed_responses_are_compressed(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': i} for i in range(30)],
+            headers)
+        url = '/shoppinglist/{}/items/?stream=true'.format(shoppinglist_id)
+        plain = self.client().get(url, headers=headers)
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+        self.app.config.update(STREAM_CHUNK_SIZE=7, STREAM_MIN_ROWS=0)
+        r = self.client().get(url, headers=dict(
+            headers, **{'Accept-Encoding': 'gzip'}))
+        self.assertTrue(r.is_streamed)
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', r.headers)
+        self.assertTrue(r.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(zlib.decompress(r.data, 16 + zlib.MAX_WBITS),
+                         plain.data)
+
+    def test_pagination_with_invalid_parameters(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        for query_string in ('limit=abc', 'limit=0', 'cursor=not-a-cursor',
+                             'q=back&cursor=eyJhZnRlciI6IDF9',
+                             # {"after": 1e400}, too large for an integer
+                             'cursor=eyJhZnRlciI6IDFlNDAwfQ',
+                             # {"after": true}
+                             'cursor=eyJhZnRlciI6IHRydWV9',
+                             # {"after": 10 ** 30} and {"after": 2 ** 63},
+                             # beyond a 64-bit ID
+                             'cursor=eyJhZnRlciI6IDEwMDAwMDAwMDAwMDAwMDAwMDAw'
+                             'MDAwMDAwMDAwMDB9',
+                             'cursor=eyJhZnRlciI6IDkyMjMzNzIwMzY4NTQ3NzU4MDh9',
+                             'limit={}'.format(10 ** 30),
+                             'limit={}'.format(2 ** 63),
+                             'limit={}'.format(2 ** 63 - 1)):
+            for url in ('/shoppinglist/?',
+                        '/shoppinglist/{}/items/?'.format(shoppinglist_id)):
+                r = self.client().get(url + query_string, headers=headers)
+                self.assertEqual(r.status_code, 400)
+
+        # the largest ID there can be
+        r = self.client().get('/shoppinglist/?limit={}&cursor=eyJhZnRlciI6IDky'
+                              'MjMzNzIwMzY4NTQ3NzU4MDd9'.format(2 ** 63 - 2),
+                              headers=headers)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data), [])
+
     def test_create_shoppinglist_item(self):
         create_item_resource = self.create_item_resource()
 
@@ -602,10 +1865,16 @@ class TestAPI(TestCase):
     def test_update_item_with_duplicate_name(self):
 
         shoppinglist_id = self.get_shoppinglist_id()
+        self.create_item_resource(shoppinglist_id)
+        item_resource = self.client().post(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            data={'name': 'sandals', 'price': 100},
+            headers=self.get_authorization_header()
+        )
 
-        # test API can update shoppinglist item
+        # test API rejects making an item identical to another one
         update_item_resource = self.client().put(
-            '/items/{}'.format(self.get_item_id(shoppinglist_id)),
+            '/items/{}'.format(json.loads(item_resource.data)['id']),
             data={
                 'name': 'touring shoes',
                 'price': '100',
@@ -616,6 +1885,43 @@ class TestAPI(TestCase):
         self.assertEqual(update_item_resource.status_code, 409)
         self.assertIn('already exist', str(update_item_resource.data))
 
+    def test_items_of_another_user_are_not_found(self):
+        item_id = self.get_item_id()
+
+        self.test_user['username'] = 'another_user'
+        headers = self.get_authorization_header()
+        for method in ('get', 'put', 'delete'):
+            r = getattr(self.client(), method)(
+                '/items/{}'.format(item_id),
+                data={'name': 'stolen', 'price': 1}, headers=headers)
+            self.assertEqual(r.status_code, 404)
+
+        self.test_user['username'] = self.username
+        r = self.client().get('/items/{}'.format(item_id),
+                              headers=self.get_authorization_header())
+        self.assertEqual(json.loads(r.data)['name'], 'touring shoes')
+
+    def test_item_is_loaded_with_a_single_query(self):
+        item_id = self.get_item_id()
+        headers = self.get_authorization_header()
+        self.client().get('/items/{}'.format(item_id), headers=headers)
+
+        with self.count_queries() as statements:
+            r = self.client().get('/items/{}'.format(item_id),
+                                  headers=headers)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(statements), 1)
+
+    def test_update_item_without_changes(self):
+        item_id = self.get_item_id()
+
+        update_item_resource = self.client().put(
+            '/items/{}'.format(item_id),
+            data={'name': 'touring shoes', 'price': '100', 'quantity': '1'},
+            headers=self.get_authorization_header()
+        )
+        self.assertEqual(update_item_resource.status_code, 200)
+
     def test_delete_item(self):
         # test API can delete shoppinglist item
         delete_item_resource = self.client().delete(
@@ -658,6 +1964,32 @@ class TestAPI(TestCase):
         self.assertIn('provide a valid item price',
                       str(create_item_resource.data))
 
+    def test_items_with_non_finite_price_or_quantity(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        url = '/shoppinglist/{}/items/'.format(shoppinglist_id)
+        for price, quantity in (('nan', 1), ('inf', 1), ('-inf', 1),
+                                (1, 'nan'), (1, 'Infinity')):
+            r = self.client().post(url, data={'name': 'milk', 'price': price,
+                                              'quantity': quantity},
+                                   headers=headers)
+            self.assertEqual(r.status_code, 400)
+
+            r = self.post_items(shoppinglist_id, [
+                {'name': 'milk', 'price': price, 'quantity': quantity}],
+                headers)
+            self.assertEqual(json.loads(r.data)[0]['status'], 400)
+
+        self.get_item_id(shoppinglist_id)
+        r = self.send_items_request('PATCH', shoppinglist_id, {
+            'filter': {}, 'changes': {'price': 'nan'}}, headers)
+        self.assertEqual(r.status_code, 400)
+
+        # the list's total is untouched
+        r = self.client().get('/shoppinglist/?fields=title&include=totals',
+                              headers=headers)
+        self.assertNotIn(b'NaN', r.data)
+
     def test_create_item_with_no_price(self):
         # create item with no price
         create_item_resource = self.client().post(
@@ -739,6 +2071,186 @@ class TestAPI(TestCase):
         self.assertEqual(get_paginated_items_resource.status_code, 200)
         self.assertEqual(len(json_data), 1)
 
+    def post_items(self, shoppinglist_id, items, headers):
+        return self.client().post(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            data=json.dumps(items), content_type='application/json',
+            headers=headers)
+
+    def test_bulk_create_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        items = [{'name': 'item {}'.format(i), 'price': i} for i in range(200)]
+
+        with self.count_queries() as statements:
+            r = self.post_items(shoppinglist_id, items, headers)
+        self.assertEqual(r.status_code, 201)
+        # list lookup, duplicate check, the list's totals and a single batch
+        # insert
+        self.assertLessEqual(len(statements), 5)
+
+        results = json.loads(r.data)
+        self.assertEqual([result['name'] for result in results],
+                         [item['name'] for item in items])
+        self.assertTrue(all(result['status'] == 201 and result['id']
+                            for result in results))
+
+        r = self.client().get(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            headers=headers)
+        self.assertEqual(len(json.loads(r.data)), 200)
+
+    def test_bulk_create_items_reports_each_item(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.create_item_resource(shoppinglist_id)
+
+        r = self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1},
+            {'name': 'touring shoes', 'price': 100},
+            {'name': 'milk', 'price': 'free'},
+            {'name': '', 'price': 1},
+            {'name': 'bread', 'price': 1},
+            'eggs',
+        ], headers)
+
+        self.assertEqual(r.status_code, 207)
+        self.assertEqual([result['status'] for result in json.loads(r.data)],
+                         [201, 409, 400, 400, 409, 400])
+
+        r = self.client().get(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            headers=headers)
+        self.assertEqual(sorted(item['name'] for item in json.loads(r.data)),
+                         ['bread', 'touring shoes'])
+
+    def send_items_request(self, method, shoppinglist_id, body, headers):
+        return self.client().open(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id), method=method,
+            data=json.dumps(body), content_type='application/json',
+            headers=headers)
+
+    def test_bulk_update_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        results = json.loads(self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1}, {'name': 'milk', 'price': 2},
+            {'name': 'eggs', 'price': 3}], headers).data)
+
+        with self.count_queries() as statements:
+            r = self.send_items_request('PATCH', shoppinglist_id, {
+                'ids': [results[0]['id'], results[1]['id']],
+                'changes': {'quantity': 0}}, headers)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)['updated'], 2)
+        self.assertLessEqual(len(statements), 4)
+
+        r = self.send_items_request('PATCH', shoppinglist_id, {
+            'filter': {'name': 'eggs'}, 'changes': {'price': 5}}, headers)
+        self.assertEqual(json.loads(r.data)['updated'], 1)
+
+        r = self.client().get(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            headers=headers)
+        self.assertEqual(
+            sorted((item['name'], item['price'], item['quantity'])
+                   for item in json.loads(r.data)),
+            [('bread', 1, 0), ('eggs', 5, 1), ('milk', 2, 0)])
+
+    def test_bulk_update_items_rejects_duplicates(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.post_items(shoppinglist_id, [
+            {'name': 'bread', 'price': 1}, {'name': 'milk', 'price': 1}],
+            headers)
+
+        r = self.send_items_request('PATCH', shoppinglist_id, {
+            'filter': {'name': 'milk'}, 'changes': {'name': 'bread'}},
+            headers)
+        self.assertEqual(r.status_code, 409)
+
+        r = self.client().get(
+            '/shoppinglist/{}/items/?q=milk'.format(shoppinglist_id),
+            headers=headers)
+        self.assertEqual(r.status_code, 200)
+
+    def test_bulk_update_items_with_invalid_body(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        for body in ({'changes': {'price': 1}},
+                     {'ids': 'all', 'changes': {'price': 1}},
+                     {'ids': [1], 'changes': {'colour': 'red'}},
+                     {'ids': [1], 'changes': {'price': 'free'}},
+                     {'ids': [1]}):
+            r = self.send_items_request('PATCH', shoppinglist_id, body,
+                                        headers)
+            self.assertEqual(r.status_code, 400)
+
+    def test_bulk_delete_items(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        results = json.loads(self.post_items(shoppinglist_id, [
+            {'name': 'item {}'.format(i), 'price': 1} for i in range(500)],
+            headers).data)
+
+        r = self.send_items_request('DELETE', shoppinglist_id, {
+            'ids': [result['id'] for result in results[:100]]}, headers)
+        self.assertEqual(json.loads(r.data)['deleted'], 100)
+
+        with self.count_queries() as statements:
+            r = self.send_items_request('DELETE', shoppinglist_id,
+                                        {'filter': {}}, headers)
+        self.assertEqual(json.loads(r.data)['deleted'], 400)
+        self.assertLessEqual(len(statements), 3)
+
+    def test_bulk_delete_items_with_invalid_ids(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        item_id = self.get_item_id(shoppinglist_id)
+        # outside the range of IDs, or not integers: true is not ID 1
+        for ids in ([10 ** 30], [2 ** 63], [-1], [True], [1.0]):
+            r = self.send_items_request('DELETE', shoppinglist_id,
+                                        {'ids': ids}, headers)
+            self.assertEqual(r.status_code, 400)
+            r = self.send_items_request('PATCH', shoppinglist_id, {
+                'ids': ids, 'changes': {'price': 1}}, headers)
+            self.assertEqual(r.status_code, 400)
+
+        r = self.send_items_request('DELETE', shoppinglist_id,
+                                    {'ids': [item_id]}, headers)
+        self.assertEqual(json.loads(r.data)['deleted'], 1)
+
+    def test_bulk_delete_items_of_another_user(self):
+        shoppinglist_id = self.get_shoppinglist_id()
+        self.create_item_resource(shoppinglist_id)
+
+        self.test_user['username'] = 'another_user'
+        r = self.send_items_request('DELETE', shoppinglist_id,
+                                    {'filter': {}},
+                                    self.get_authorization_header())
+        self.assertEqual(r.status_code, 404)
+
+        self.test_user['username'] = self.username
+        r = self.client().get(
+            '/shoppinglist/{}/items/'.format(shoppinglist_id),
+            headers=self.get_authorization_header())
+        self.assertEqual(len(json.loads(r.data)), 1)
+
+    def test_bulk_create_items_limits(self):
+        headers = self.get_authorization_header()
+        shoppinglist_id = self.get_shoppinglist_id()
+        r = self.post_items(shoppinglist_id, [], headers)
+        self.assertEqual(r.status_code, 400)
+
+        self.app.config['MAX_BULK_ITEMS'] = 2
+        r = self.post_items(shoppinglist_id, [{'name': 'a', 'price': 1}] * 3,
+                            headers)
+        self.assertEqual(r.status_code, 413)
+
+        r = self.post_items(shoppinglist_id, [{'name': 'a', 'price': 1}] * 2,
+                            headers)
+        self.assertEqual(r.status_code, 207)
+
     def tearDown(self):
         with self.app.app_context():
             # drop all tables